@@ -0,0 +1,135 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from mixer.backend.django import mixer
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import encode_cursor
+
+
+class ApiViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = mixer.blend(Group, slug='group')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {number}'
+            )
+            for number in range(3)
+        ]
+        self.guest_client = Client()
+
+    def test_feeds_return_posts(self):
+        """Ленты API отдают посты в порядке публикации."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        reader_client = Client()
+        reader_client.force_login(reader)
+        expected = [post.pk for post in reversed(self.posts)]
+        for client, url in (
+            (self.guest_client, reverse('api:index')),
+            (self.guest_client, reverse('api:group_posts', args=['group'])),
+            (self.guest_client, reverse('api:profile', args=['author'])),
+            (reader_client, reverse('api:follow_index')),
+        ):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [post['id'] for post in response.json()['results']],
+                    expected
+                )
+
+    def test_follow_requires_login(self):
+        response = self.guest_client.get(reverse('api:follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_cursor_pagination(self):
+        """Курсор ``next`` ведёт на следующую страницу без повторов."""
+        url = reverse('api:index')
+        first = self.guest_client.get(url, {'limit': 2}).json()
+        self.assertIsNone(first['previous'])
+        second = self.guest_client.get(first['next']).json()
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+        self.assertIsNone(second['next'])
+        for cursor in (
+            'мусор',
+            encode_cursor(['2020-01-01T00:00:00', 'abc']),
+            encode_cursor(['2020-01-01T00:00:00', {'id': 1}]),
+            encode_cursor(['2020-01-01T00:00:00', None]),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.guest_client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+
+    def test_field_selection(self):
+        url = reverse('api:post_detail', args=[self.posts[0].pk])
+        response = self.guest_client.get(url, {'fields': 'id,author'})
+        self.assertEqual(
+            response.json(), {'id': self.posts[0].pk, 'author': 'author'}
+        )
+        response = self.guest_client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_conditional_get(self):
+        """Совпавший ETag даёт 304, изменение поста — новый ETag."""
+        post = self.posts[0]
+        url = reverse('api:post_detail', args=[post.pk])
+        response = self.guest_client.get(url)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_follows_comments_and_authors(self):
+        """ETag ленты меняется от новых комментариев и смены автора."""
+        url = reverse('api:index')
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.posts[0], author=self.author, text='Комментарий'
+        )
+        commented = self.guest_client.get(url)['ETag']
+        self.assertNotEqual(commented, etag)
+        self.author.username = 'renamed'
+        self.author.save()
+        self.assertNotEqual(self.guest_client.get(url)['ETag'], commented)
+
+    def test_list_not_modified_without_queries(self):
+        """Совпавший ETag списка — 304 без запросов к базе; одной даты
+        If-Modified-Since для 304 недостаточно."""
+        url = reverse('api:group_posts', args=['group'])
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.posts[0].delete()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_comments(self):
+        post = self.posts[0]
+        comments = [
+            Comment.objects.create(
+                post=post, author=self.author, text=f'Комментарий {number}'
+            )
+            for number in range(2)
+        ]
+        response = self.guest_client.get(
+            reverse('api:post_comments', args=[post.pk]),
+            {'fields': 'id,author'}
+        )
+        self.assertEqual(response.json()['results'], [
+            {'id': comment.pk, 'author': 'author'}
+            for comment in reversed(comments)
+        ])
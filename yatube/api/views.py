@@ -0,0 +1,228 @@
+import hashlib
+import json
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+from posts.cache import FEED_VERSION_KEY, card_cache_keys, get_version
+from posts.models import Group, Post, User
+from posts.timeline import timeline_posts
+from posts.utils import COMMENT_ORDERING, InvalidCursor, KeysetPaginator
+from yatube.settings import POSTS_NUMBER
+
+MAX_LIMIT = 100
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'updated': lambda post: post.updated.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'post': lambda comment: comment.post_id,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created.isoformat(),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def error(detail, status):
+    return JsonResponse(
+        {'detail': detail}, status=status,
+        json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def get_fields(request, serializers):
+    """Поля из параметра ``fields`` или все поля ресурса."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(serializers)
+    fields = list(dict.fromkeys(
+        field.strip() for field in requested.split(',') if field.strip()
+    ))
+    unknown = [field for field in fields if field not in serializers]
+    if unknown or not fields:
+        raise BadRequest(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', POSTS_NUMBER))
+    except ValueError:
+        raise BadRequest('Параметр limit должен быть числом')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def serialize(obj, serializers, fields):
+    return {field: serializers[field](obj) for field in fields}
+
+
+def make_etag(*parts):
+    """Сильный ETag: хэш от версий всего, что попадает в ответ."""
+    digest = hashlib.sha1(
+        json.dumps(parts, default=str, separators=(',', ':')).encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request, etag):
+    """304, если у клиента актуальная версия, иначе ``None``."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def conditional_json(request, etag, payload):
+    """Отвечает 304 по совпавшему ETag или собирает JSON.
+
+    ``payload`` вызывается только тогда, когда клиенту нужно тело.
+    Last-Modified не отдаётся: дата правки поста не меняется ни от
+    комментариев, ни от переименования автора, ни от удаления поста
+    из списка, и клиент с одним If-Modified-Since получал бы 304 на
+    устаревший ответ.
+    """
+    response = not_modified(request, etag)
+    if response is None:
+        response = JsonResponse(
+            payload(), json_dumps_params={'ensure_ascii': False}
+        )
+        response['ETag'] = etag
+    return response
+
+
+def feed_etag(request):
+    """ETag общего списка, известный до запроса к базе.
+
+    Версию ленты сигналы увеличивают при любом изменении постов, групп,
+    комментариев и имён пользователей, то есть всего, что попадает в
+    ответ, поэтому 304 отдаётся вовсе без запросов к базе.
+    """
+    return make_etag(request.get_full_path(), get_version(FEED_VERSION_KEY))
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(
+        f'{request.path}?{urlencode(sorted(query.items()))}'
+    )
+
+
+def paginated(request, queryset, serializers, ordering, etag=None,
+              version_of=None):
+    """Страница ресурсов по курсору с ETag: заранее известным или от
+    версий ``version_of`` того, что попало на страницу."""
+    try:
+        fields = get_fields(request, serializers)
+        page = KeysetPaginator(
+            queryset, get_limit(request), ordering
+        ).get_page(request.GET.get('cursor'), strict=True)
+    except BadRequest as exc:
+        return error(str(exc), 400)
+    except InvalidCursor:
+        return error('Неверный курсор', 400)
+    if etag is None:
+        etag = make_etag(
+            fields, page.next_cursor, page.previous_cursor,
+            version_of(page.object_list)
+        )
+    return conditional_json(request, etag, lambda: {
+        'results': [
+            serialize(obj, serializers, fields) for obj in page.object_list
+        ],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    })
+
+
+def post_versions(posts):
+    # Ключ карточки меняется вместе с постом, автором и группой;
+    # число комментариев обновляется в обход сигналов сохранения.
+    keys = card_cache_keys(posts)
+    return [(keys[post.pk], post.comments_count) for post in posts]
+
+
+def post_page(request, queryset, etag=None):
+    return paginated(
+        request, queryset.for_feed(), POST_FIELDS, ('-pub_date', '-id'),
+        etag=etag, version_of=post_versions
+    )
+
+
+def feed_page(view):
+    """Общий список: совпавший ETag — 304 до любых запросов к базе."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        etag = feed_etag(request)
+        return not_modified(request, etag) or view(
+            request, *args, etag=etag, **kwargs
+        )
+    return wrapper
+
+
+@require_safe
+@feed_page
+def index(request, etag):
+    return post_page(request, Post.objects.all(), etag)
+
+
+@require_safe
+@feed_page
+def group_posts(request, slug, etag):
+    group = get_object_or_404(Group, slug=slug)
+    return post_page(request, group.posts.all(), etag)
+
+
+@require_safe
+@feed_page
+def profile(request, username, etag):
+    author = get_object_or_404(User, username=username)
+    return post_page(request, author.posts.all(), etag)
+
+
+@require_safe
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error('Требуется авторизация', 401)
+    return post_page(request, timeline_posts(request.user))
+
+
+@require_safe
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), id=post_id)
+    try:
+        fields = get_fields(request, POST_FIELDS)
+    except BadRequest as exc:
+        return error(str(exc), 400)
+    etag = make_etag(fields, post_versions([post]))
+    return conditional_json(
+        request, etag, lambda: serialize(post, POST_FIELDS, fields)
+    )
+
+
+@require_safe
+@feed_page
+def post_comments(request, post_id, etag):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    return paginated(
+        request, post.comments.with_authors(), COMMENT_FIELDS,
+        COMMENT_ORDERING, etag=etag
+    )
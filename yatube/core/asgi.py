@@ -0,0 +1,225 @@
+"""Минимальная ASGI-обвязка для Django 2.2, который умеет только WSGI.
+
+``Router`` отдаёт запросы с подходящим путём асинхронным обработчикам,
+а остальные — WSGI-приложению Django в пуле потоков. Так один процесс
+держит тысячи долгих соединений (Server-Sent Events) и при этом
+обслуживает обычные страницы.
+"""
+import asyncio
+import io
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        from django.conf import settings
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS, thread_name_prefix='asgi'
+        )
+    return _executor
+
+
+def _call_sync(func, args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(func, *args):
+    """Выполняет синхронный код (ORM, сессии) в пуле потоков."""
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), _call_sync, func, args
+    )
+
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return bytes(body)
+        body.extend(message.get('body', b''))
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+async def respond(send, status, body=b'', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'text/plain; charset=utf-8'), *headers
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def make_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # PATH_INFO в WSGI — байты UTF-8, прочитанные как latin-1.
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class WsgiBridge:
+    """Выполняет WSGI-приложение в пуле потоков.
+
+    Ответ собирается целиком: потоковые ответы Django на сайте — это
+    только файлы медиа, которые в продакшене отдаёт веб-сервер.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    def run(self, environ):
+        response = {}
+        chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+            return chunks.append
+
+        result = self.application(environ, start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], b''.join(chunks)
+
+    async def __call__(self, scope, receive, send):
+        body = await read_body(receive)
+        status, headers, content = await asyncio.get_running_loop(
+        ).run_in_executor(get_executor(), self.run, make_environ(scope, body))
+        await send({
+            'type': 'http.response.start', 'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+
+async def event_stream(receive, send, events):
+    """Отдаёт байты асинхронного генератора ``events`` как
+    ``text/event-stream``, пока генератор не кончится или клиент не
+    отключится."""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            # Иначе nginx копит события в буфере.
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        while True:
+            step = asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait(
+                {step, disconnected}, return_when=FIRST_COMPLETED
+            )
+            if step not in done:
+                step.cancel()
+                # Генератор должен закрыться до aclose() ниже.
+                await asyncio.wait({step})
+                return
+            try:
+                chunk = step.result()
+            except StopAsyncIteration:
+                break
+            await send({
+                'type': 'http.response.body', 'body': chunk,
+                'more_body': True,
+            })
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        await events.aclose()
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+class Router:
+    """ASGI-приложение: ``routes`` — пары «регулярное выражение пути —
+    асинхронный обработчик», именованные группы передаются в
+    обработчик аргументами."""
+
+    def __init__(self, routes, fallback):
+        self.routes = [
+            (re.compile(pattern), handler) for pattern, handler in routes
+        ]
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип соединения: '
+                             f'{scope["type"]}')
+        for pattern, handler in self.routes:
+            match = pattern.match(scope['path'])
+            if match:
+                return await handler(
+                    scope, receive, send, **match.groupdict()
+                )
+        return await self.fallback(scope, receive, send)
@@ -0,0 +1,43 @@
+"""Загрузка пользователя сессии из кэша.
+
+``AuthenticationMiddleware`` на каждом запросе ищет пользователя сессии
+в базе. ``CachedModelBackend`` держит его в кэше ``USER_CACHE``;
+сохранение или удаление пользователя сбрасывает запись (core.signals),
+а изменения в обход сигналов (``QuerySet.update``) видны не позже чем
+через ``USER_CACHE_TIMEOUT`` секунд.
+
+Неверные учётные данные он отклоняет окончательно (``PermissionDenied``):
+``ModelBackend`` после него в настройках нужен только для старых сессий
+и снова прогнал бы пароль через хешер.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    caches[settings.USER_CACHE].delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username, password, **kwargs)
+        if user is None:
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        cache = caches[settings.USER_CACHE]
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,499 @@
+"""Бэкенды кэша.
+
+``TieredCache`` — двухуровневый кэш: ограниченный LRU в памяти
+процесса (L1) перед общим для всех процессов кэшем (L2), например
+``SQLiteCache`` в файле на этой же машине или memcached. Запись идёт
+в L2 и рассылается остальным процессам через сам L2: номер сообщения
+берётся ``incr`` общего счётчика, под ним сохраняется изменённый ключ.
+Процесс не чаще раза в ``SYNC_INTERVAL`` секунд читает новые сообщения
+и выбрасывает эти ключи из своего L1; если сообщения потерялись или
+их слишком много, L1 очищается целиком. Поэтому чужая запись видна
+процессу не позже чем через ``SYNC_INTERVAL``, а своя — сразу.
+
+Значения со сроком лежат в L2 вместе с моментом истечения
+(``Expiring``), и копия в L1 живёт не дольше записи в L2. Бессрочные
+значения хранятся как есть, и ``incr`` любого L2 работает с ними.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import metrics
+
+_missing = object()
+
+# Значение в L2 и момент его истечения по time.time().
+Expiring = namedtuple('Expiring', 'value expires')
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи чтений для метрик запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            metrics.record_cache(0, 1)
+            return default
+        metrics.record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with metrics.cache_batch():
+            values = super().get_many(keys, version)
+        metrics.record_cache(len(values), len(keys) - len(values))
+        return values
+
+
+class MeteredLocMemCache(CacheMetricsMixin, LocMemCache):
+    pass
+
+
+def is_process_local(cache):
+    """Кэш, записи которого не видят другие процессы."""
+    return isinstance(cache, LocMemCache)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite: общий для процессов одной машины, без
+    отдельного сервера. ``add`` и ``incr`` атомарны."""
+
+    CULL_EVERY = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _alive(expires):
+        return expires is None or expires > time.time()
+
+    def get(self, key, default=None, version=None):
+        row = self.connection.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            [self._key(key, version)]
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        made = {self._key(key, version): key for key in keys}
+        result = {}
+        names = list(made)
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            rows = self.connection.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN '
+                f'({", ".join("?" * len(chunk))})', chunk
+            )
+            for name, value, expires in rows:
+                if self._alive(expires):
+                    result[made[name]] = pickle.loads(value)
+        return result
+
+    def _row(self, key, value, timeout, version):
+        return (
+            self._key(key, version),
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self.get_backend_timeout(timeout),
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = [
+            self._row(key, value, timeout, version)
+            for key, value in data.items()
+        ]
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)', rows
+        )
+        self._maybe_cull(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Занятый, но истёкший ключ перезаписывается, живой — нет.
+        cursor = self.connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            [*self._row(key, value, timeout, version), time.time()]
+        )
+        self._maybe_cull(cursor.rowcount)
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', [key]
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            stored = pickle.loads(row[0])
+            # Счётчик со сроком, записанный через TieredCache.
+            if isinstance(stored, Expiring):
+                value = stored.value + delta
+                stored = stored._replace(value=value)
+            else:
+                value = stored = stored + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [pickle.dumps(stored, pickle.HIGHEST_PROTOCOL), key]
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()]
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        cursor = self.connection.execute(
+            'DELETE FROM cache WHERE key = ?', [self._key(key, version)]
+        )
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        self.connection.executemany(
+            'DELETE FROM cache WHERE key = ?',
+            [[self._key(key, version)] for key in keys]
+        )
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def _maybe_cull(self, written):
+        self._writes += written
+        if self._writes < self.CULL_EVERY:
+            return
+        self._writes = 0
+        connection = self.connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', [time.time()]
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            # Первыми уходят записи, которые раньше всех истекут.
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                [count // self._cull_frequency]
+            )
+
+
+class LocalTier:
+    """LRU в памяти процесса с временем жизни записей и пределами по
+    числу записей и байтам. Значения хранятся сериализованными, как в
+    ``LocMemCache``, чтобы вызывающий не менял общий объект."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        # Состояние рассылки: последнее прочитанное сообщение, время
+        # чтения и номера собственных сообщений.
+        self.seq = None
+        self.synced_at = 0.0
+        self.own = set()
+        self.sync_lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, pickled, ttl):
+        with self.lock:
+            self._pop(key)
+            self.entries[key] = (pickled, time.monotonic() + ttl)
+            self.size += len(pickled)
+            while self.entries and (len(self.entries) > self.max_entries
+                                    or self.size > self.max_bytes):
+                self._pop(next(iter(self.entries)))
+
+    def delete(self, keys):
+        with self.lock:
+            for key in keys:
+                self._pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class BaseTieredCache(BaseCache):
+    """L1 в памяти процесса перед общим кэшем ``OPTIONS['L2']``.
+
+    Атомарные операции (``add``, ``incr``) выполняет L2. ``SQLiteCache``
+    умеет ``incr`` и для значений со сроком, остальные L2 — только для
+    бессрочных. ``LOCATION``
+    называет L1: экземпляры бэкенда в разных потоках одного процесса
+    делят его, как ``LocMemCache``.
+    """
+
+    SEQ_KEY = 'tiered:seq'
+    MESSAGE_KEY = 'tiered:message:{}'
+    MESSAGE_TIMEOUT = 300
+    MAX_BACKLOG = 1000
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = options['L2']
+        self.l1_timeout = options.get('L1_TIMEOUT', 60)
+        self.sync_interval = options.get('SYNC_INTERVAL', 0.5)
+        with _tiers_lock:
+            self.l1 = _tiers.setdefault(location, LocalTier(
+                options.get('L1_MAX_ENTRIES', 1000),
+                options.get('L1_MAX_BYTES', 32 * 1024 * 1024),
+            ))
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def _wrap(self, value, expires):
+        return value if expires is None else Expiring(value, expires)
+
+    def _store(self, key, value, expires):
+        ttl = self.l1_timeout
+        if expires is not None:
+            ttl = min(ttl, expires - time.time())
+        if ttl > 0:
+            self.l1.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+
+    def _fetched(self, key, stored):
+        """Значение из L2; копия в L1 истекает не позже записи в L2."""
+        if isinstance(stored, Expiring):
+            self._store(key, stored.value, stored.expires)
+            return stored.value
+        self._store(key, stored, None)
+        return stored
+
+    def get(self, key, default=None, version=None):
+        self.sync()
+        made = self._key(key, version)
+        pickled = self.l1.get(made)
+        if pickled is not None:
+            return pickle.loads(pickled)
+        stored = self.l2.get(key, _missing, version)
+        if stored is _missing:
+            return default
+        return self._fetched(made, stored)
+
+    def get_many(self, keys, version=None):
+        self.sync()
+        result = {}
+        missing = {}
+        for key in keys:
+            made = self._key(key, version)
+            pickled = self.l1.get(made)
+            if pickled is None:
+                missing[key] = made
+            else:
+                result[key] = pickle.loads(pickled)
+        if missing:
+            fetched = self.l2.get_many(list(missing), version)
+            for key, stored in fetched.items():
+                result[key] = self._fetched(missing[key], stored)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        self.l2.set(key, self._wrap(value, expires), timeout, version)
+        made = self._key(key, version)
+        self._store(made, value, expires)
+        self.publish([made])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        failed = self.l2.set_many({
+            key: self._wrap(value, expires) for key, value in data.items()
+        }, timeout, version)
+        made = [self._key(key, version) for key in data]
+        for key, value in zip(made, data.values()):
+            self._store(key, value, expires)
+        self.publish(made)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        added = self.l2.add(
+            key, self._wrap(value, expires), timeout, version
+        )
+        if added:
+            self._forget([self._key(key, version)])
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version)
+        self._forget([self._key(key, version)])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # Новый срок в L2 без перезаписи значения: обёртка хранит
+        # прежний, и копия в L1 по нему лишь истечёт раньше.
+        touched = self.l2.touch(key, timeout, version)
+        self._forget([self._key(key, version)])
+        return touched
+
+    def delete(self, key, version=None):
+        deleted = self.l2.delete(key, version)
+        self._forget([self._key(key, version)])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l2.delete_many(keys, version)
+        self._forget([self._key(key, version) for key in keys])
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def clear(self):
+        # Сброс L2 сбрасывает и счётчик сообщений: остальные процессы
+        # увидят, что он уменьшился, и очистят свой L1.
+        self.l2.clear()
+        self.l1.clear()
+        self.l1.seq = 0
+
+    def _forget(self, keys):
+        self.l1.delete(keys)
+        self.publish(keys)
+
+    def publish(self, keys):
+        """Рассылает остальным процессам, что ``keys`` изменились."""
+        if not keys:
+            return
+        l2 = self.l2
+        try:
+            last = l2.incr(self.SEQ_KEY, len(keys))
+        except ValueError:
+            l2.add(self.SEQ_KEY, 0, None)
+            last = l2.incr(self.SEQ_KEY, len(keys))
+        numbers = range(last - len(keys) + 1, last + 1)
+        l2.set_many({
+            self.MESSAGE_KEY.format(number): key
+            for number, key in zip(numbers, keys)
+        }, self.MESSAGE_TIMEOUT)
+        with self.l1.lock:
+            if len(self.l1.own) > self.MAX_BACKLOG:
+                self.l1.own.clear()
+            self.l1.own.update(numbers)
+
+    def sync(self, force=False):
+        """Выбрасывает из L1 ключи, изменённые другими процессами."""
+        tier = self.l1
+        now = time.monotonic()
+        if not force and now - tier.synced_at < self.sync_interval:
+            return
+        if not tier.sync_lock.acquire(blocking=False):
+            return
+        try:
+            tier.synced_at = now
+            self._apply(self.l2.get(self.SEQ_KEY, 0))
+        finally:
+            tier.sync_lock.release()
+
+    def _apply(self, seq):
+        tier = self.l1
+        previous, tier.seq = tier.seq, seq
+        if previous is None or seq == previous:
+            return
+        if seq < previous:
+            # Общий кэш сброшен или перезапущен.
+            tier.clear()
+            return
+        numbers = range(previous + 1, seq + 1)
+        with tier.lock:
+            foreign = [number for number in numbers
+                       if number not in tier.own]
+            tier.own.difference_update(numbers)
+        if len(foreign) > self.MAX_BACKLOG:
+            tier.clear()
+            return
+        messages = self.l2.get_many(
+            [self.MESSAGE_KEY.format(number) for number in foreign]
+        )
+        if len(messages) < len(foreign):
+            # Часть сообщений истекла или ещё не записана: неизвестно,
+            # что поменялось, надёжнее начать с пустого L1.
+            tier.clear()
+            return
+        tier.delete(messages.values())
+
+
+class TieredCache(CacheMetricsMixin, BaseTieredCache):
+    pass
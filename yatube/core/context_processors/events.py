@@ -0,0 +1,8 @@
+from django.conf import settings
+
+
+def events(request):
+    """Добавляет адрес потоков событий лент, если они включены."""
+    return {
+        'events_url': settings.EVENTS_URL
+    }
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core.sessions import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истёкшие сессии из базы пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько сессий удалять одним запросом.'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза в секундах между пачками.'
+        )
+
+    def handle(self, *args, **options):
+        purged = purge_expired(options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено истёкших сессий: {purged}.'
+        ))
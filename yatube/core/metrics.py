@@ -0,0 +1,285 @@
+"""Метрики запросов в памяти процесса в формате Prometheus.
+
+Счётчики и гистограммы живут в памяти воркера, поэтому каждый процесс
+отдаёт свои значения, а суммирует их Prometheus. Подробные замеры
+снимаются только с доли запросов ``METRICS_SAMPLE_RATE``, остальные
+лишь считаются.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_local = threading.local()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n'
+    )
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in pairs
+    ) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name, _format_labels(self.labels, labels), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [
+                    [0] * len(self.buckets), 0.0, 0
+                ]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, *labels):
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self._values.items()
+            )
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield f'{self.name}_bucket', _format_labels(
+                    self.labels, labels, [('le', _format_number(bound))]
+                ), cumulative
+            yield f'{self.name}_bucket', _format_labels(
+                self.labels, labels, [('le', '+Inf')]
+            ), count
+            yield f'{self.name}_sum', _format_labels(
+                self.labels, labels
+            ), total
+            yield f'{self.name}_count', _format_labels(
+                self.labels, labels
+            ), count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    'yatube_requests_total', 'Обработанные запросы.',
+    ('view', 'method', 'status'),
+))
+SAMPLED = registry.register(Counter(
+    'yatube_sampled_requests_total', 'Запросы с подробными замерами.',
+    ('view',),
+))
+REQUEST_DURATION = registry.register(Histogram(
+    'yatube_request_duration_seconds', 'Время обработки запроса.',
+    ('view',),
+))
+DB_QUERIES = registry.register(Histogram(
+    'yatube_db_queries', 'SQL-запросов на один запрос.',
+    ('view',), QUERY_BUCKETS,
+))
+DB_DURATION = registry.register(Histogram(
+    'yatube_db_duration_seconds', 'Время SQL-запросов за один запрос.',
+    ('view',),
+))
+TEMPLATE_DURATION = registry.register(Histogram(
+    'yatube_template_render_seconds', 'Время отрисовки шаблонов.',
+    ('view',),
+))
+CACHE_REQUESTS = registry.register(Counter(
+    'yatube_cache_requests_total', 'Обращения к кэшу за значениями.',
+    ('view', 'result'),
+))
+RATELIMIT_CHECKS = registry.register(Counter(
+    'yatube_ratelimit_checks_total', 'Проверки ограничения частоты.',
+    ('rule', 'result'),
+))
+
+
+class RequestStats:
+    """Замеры одного запроса; заодно обёртка курсора БД."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - start
+
+
+def current():
+    """Замеры текущего запроса или ``None``, если он не в выборке."""
+    return getattr(_local, 'stats', None)
+
+
+def record_cache(hits, misses):
+    stats = current()
+    if stats is not None and not stats.cache_depth:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+@contextmanager
+def cache_batch():
+    """Внутри пакетного чтения одиночные ``get`` не считаются."""
+    stats = current()
+    if stats is None:
+        yield
+        return
+    stats.cache_depth += 1
+    try:
+        yield
+    finally:
+        stats.cache_depth -= 1
+
+
+@contextmanager
+def template_timer():
+    """Меряет внешний шаблон; вложенные уже входят в его время."""
+    stats = current()
+    if stats is None:
+        yield
+        return
+    stats.template_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.template_depth -= 1
+        if not stats.template_depth:
+            stats.template_time += time.perf_counter() - start
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class MetricsMiddleware:
+    """Собирает метрики запросов; ставится первым в MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            response = self.get_response(request)
+            self.count(request, response)
+            return response
+        stats = _local.stats = RequestStats()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        duration = time.perf_counter() - start
+        if self.count(request, response):
+            self.observe(view_name(request), stats, duration)
+        return response
+
+    def count(self, request, response):
+        view = view_name(request)
+        if view == 'metrics':
+            return False
+        REQUESTS.inc(view, request.method, str(response.status_code))
+        return True
+
+    def observe(self, view, stats, duration):
+        SAMPLED.inc(view)
+        REQUEST_DURATION.observe(duration, view)
+        DB_QUERIES.observe(stats.queries, view)
+        DB_DURATION.observe(stats.query_time, view)
+        TEMPLATE_DURATION.observe(stats.template_time, view)
+        CACHE_REQUESTS.inc(view, 'hit', amount=stats.cache_hits)
+        CACHE_REQUESTS.inc(view, 'miss', amount=stats.cache_misses)
@@ -0,0 +1,174 @@
+"""Журнал медленных SQL-запросов и поиск N+1 в пределах запроса.
+
+Обёртка курсора замеряет каждый запрос. Медленные запросы и запросы
+одной формы, повторённые ``NPLUSONE_THRESHOLD`` раз, пишутся в журнал
+вместе с представлением, строкой кода и строкой шаблона, откуда они
+пришли. Представление может объявить бюджет запросов декоратором
+``query_budget``; при ``QUERY_BUDGET_STRICT`` превышение бюджета
+и повторы становятся исключениями, чтобы тесты падали. Нормализация
+SQL стоит регулярных выражений на каждый запрос, поэтому повторы
+ищутся только в доле запросов ``NPLUSONE_SAMPLE_RATE``.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+NUMBER_RE = re.compile(r'\b\d+\b')
+# Обёртки курсора и шаблонов сами не бывают источником запросов.
+INSTRUMENTATION_FILES = {
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ('cache.py', 'metrics.py', 'querylog.py',
+                 'template_backends.py')
+}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class NPlusOneDetected(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может сделать представление."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def query_shape(sql):
+    """SQL без значений: списки IN и числа сворачиваются."""
+    return NUMBER_RE.sub('N', IN_LIST_RE.sub('(%s, ...)', sql))
+
+
+def template_origin():
+    """Шаблон и строка узла, который сейчас отрисовывается."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if frame.f_code.co_name == 'render_annotated' and isinstance(
+            node, Node
+        ):
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                return f'{origin.template_name or origin.name}:{token.lineno}'
+        frame = frame.f_back
+    return None
+
+
+def code_origin():
+    """Ближайшая строка кода проекта, которая привела к запросу."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(settings.BASE_DIR)
+            and filename not in INSTRUMENTATION_FILES
+        ):
+            return '{}:{} in {}'.format(
+                os.path.relpath(filename, settings.BASE_DIR),
+                frame.f_lineno, frame.f_code.co_name
+            )
+        frame = frame.f_back
+    return None
+
+
+class QueryInspector:
+    """Обёртка курсора на время одного запроса."""
+
+    def __init__(self, request, strict=False, shapes=True):
+        self.request = request
+        self.strict = strict
+        self.track_shapes = shapes
+        self.count = 0
+        self.shapes = Counter()
+        self.errors = []
+
+    @property
+    def view(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else self.request.path
+
+    def origin(self):
+        parts = [code_origin(), template_origin()]
+        return ', '.join(part for part in parts if part) or 'неизвестно'
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            if duration * 1000 >= settings.SLOW_QUERY_MS:
+                logger.warning(
+                    'Медленный запрос %.1f мс в %s (%s): %s',
+                    duration * 1000, self.view, self.origin(), sql
+                )
+            if self.track_shapes:
+                self.track(sql)
+
+    def track(self, sql):
+        shape = query_shape(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == settings.NPLUSONE_THRESHOLD:
+            self.repeated(shape)
+
+    def repeated(self, shape):
+        message = (
+            f'Запрос повторён {settings.NPLUSONE_THRESHOLD} раз '
+            f'в {self.view} ({self.origin()}): {shape}'
+        )
+        logger.warning(message)
+        if self.strict:
+            self.errors.append(NPlusOneDetected(message))
+
+    def check_budget(self, budget):
+        if budget is None or self.count <= budget:
+            return
+        message = (
+            f'{self.view} сделал {self.count} SQL-запросов '
+            f'при бюджете {budget}'
+        )
+        logger.warning(message)
+        if self.strict:
+            self.errors.append(QueryBudgetExceeded(message))
+
+
+class QueryLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        strict = settings.QUERY_BUDGET_STRICT
+        inspector = QueryInspector(
+            request, strict,
+            shapes=strict or random.random() < settings.NPLUSONE_SAMPLE_RATE
+        )
+        request.query_budget = None
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(inspector))
+            response = self.get_response(request)
+        inspector.check_budget(request.query_budget)
+        if inspector.errors:
+            raise inspector.errors[0]
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
@@ -0,0 +1,132 @@
+"""Ограничение частоты запросов по алгоритму token bucket.
+
+У каждого ключа (пользователь или адрес клиента) есть «ведро» на
+``burst`` жетонов, которое наполняется со скоростью ``rate``. Запрос
+забирает жетон; если жетона нет, клиент сразу получает 429 с
+заголовком ``Retry-After`` — без шаблонов и запросов к базе.
+
+Правило объявляется декоратором ``ratelimit`` у представления или
+задаётся в ``settings.RATELIMITS`` по имени адреса (так ограничиваются
+и представления-классы, которые нельзя обернуть декоратором). Правило
+из настроек важнее объявленного в коде, ``None`` снимает ограничение.
+Состояние вёдер хранится в кэше ``RATELIMIT_CACHE``: чтобы лимит был
+общим для всех процессов, кэш должен быть общим и без локального
+уровня (в двухуровневых профилях — L2 ``shared``). Чтение и запись
+ведра не атомарны, поэтому при гонке нескольких процессов лишний
+запрос-другой может пройти.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .metrics import RATELIMIT_CHECKS
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+KEYS = ('user', 'ip')
+
+
+class Rule:
+    def __init__(self, rate, burst=None, key='user', methods=('POST',)):
+        count, _, period = rate.partition('/')
+        if key not in KEYS or period not in PERIODS:
+            raise ValueError(f'Неверное правило: {rate}, ключ {key}')
+        self.refill = int(count) / PERIODS[period]
+        self.capacity = burst or int(count)
+        self.key = key
+        self.methods = tuple(methods) if methods else None
+
+    @classmethod
+    def from_config(cls, config):
+        if config is None or isinstance(config, cls):
+            return config
+        return cls(**config)
+
+    def applies(self, request):
+        return self.methods is None or request.method in self.methods
+
+    def identity(self, request):
+        if self.key == 'user' and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{request.META.get("REMOTE_ADDR")}'
+
+    def take(self, key, now=None):
+        """Забирает жетон; возвращает 0 или сколько секунд ждать."""
+        now = time.time() if now is None else now
+        cache = caches[settings.RATELIMIT_CACHE]
+        tokens, stamp = cache.get(key) or (self.capacity, now)
+        tokens = min(self.capacity, tokens + (now - stamp) * self.refill)
+        wait = 0 if tokens >= 1 else (1 - tokens) / self.refill
+        if not wait:
+            tokens -= 1
+        # Запись живёт, пока ведро не наполнится: истёкшая запись и
+        # полное ведро — одно и то же.
+        cache.set(
+            key, (tokens, now),
+            math.ceil((self.capacity - tokens) / self.refill) + 1
+        )
+        return wait
+
+
+def too_many_requests(wait):
+    response = HttpResponse(
+        'Слишком много запросов, попробуйте позже.', status=429,
+        content_type='text/plain; charset=utf-8'
+    )
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def check(request, name, config):
+    """429 для запроса сверх правила ``config`` или ``None``."""
+    rule = Rule.from_config(config)
+    if rule is None or not rule.applies(request):
+        return None
+    wait = rule.take(f'ratelimit:{name}:{rule.identity(request)}')
+    RATELIMIT_CHECKS.inc(name, 'limited' if wait else 'allowed')
+    return too_many_requests(wait) if wait else None
+
+
+def url_name(request):
+    match = request.resolver_match
+    return match.view_name if match else request.path
+
+
+def ratelimit(rate, burst=None, key='user', methods=('POST',)):
+    """Ограничивает частоту запросов к представлению."""
+    declared = Rule(rate, burst, key, methods)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            name = url_name(request)
+            response = check(
+                request, name, settings.RATELIMITS.get(name, declared)
+            )
+            if response is not None:
+                return response
+            return view(request, *args, **kwargs)
+
+        wrapper.ratelimit = declared
+        return wrapper
+    return decorator
+
+
+class RateLimitMiddleware:
+    """Применяет ``settings.RATELIMITS`` к представлениям без
+    декоратора ``ratelimit``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(view_func, 'ratelimit'):
+            return None
+        name = url_name(request)
+        return check(request, name, settings.RATELIMITS.get(name))
@@ -0,0 +1,49 @@
+"""Сессии в кэше с записью в базу (``SESSION_ENGINE = 'core.sessions'``).
+
+Это ``cached_db`` Django: сессия читается из кэша ``SESSION_CACHE_ALIAS``
+и лишь при промахе из базы, а сохраняется и в базу, и в кэш. Поверх
+него сессия не пишется, если её данные не изменились: Django помечает
+сессию изменённой при любом присваивании, даже того же значения.
+
+Истёкшие сессии из кэша уходят сами, а из базы их удаляет
+``manage.py purge_sessions`` пачками, не держа блокировку таблицы на
+всё удаление, как ``clearsessions``.
+"""
+import time
+
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+
+class SessionStore(cached_db.SessionStore):
+    def load(self):
+        data = super().load()
+        self._loaded = self.serializer().dumps(data)
+        return data
+
+    def save(self, must_create=False):
+        loaded = getattr(self, '_loaded', None)
+        if (
+            not must_create and loaded is not None
+            and self.session_key is not None
+            and self.serializer().dumps(self._session) == loaded
+        ):
+            return
+        super().save(must_create)
+        self._loaded = self.serializer().dumps(self._session)
+
+
+def purge_expired(batch_size=1000, pause=0):
+    """Удаляет истёкшие сессии пачками по ``batch_size``; возвращает,
+    сколько удалено."""
+    purged = 0
+    while True:
+        keys = list(Session.objects.filter(
+            expire_date__lt=timezone.now()
+        ).values_list('session_key', flat=True)[:batch_size])
+        if not keys:
+            return purged
+        purged += Session.objects.filter(session_key__in=keys).delete()[0]
+        if pause:
+            time.sleep(pause)
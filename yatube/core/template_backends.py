@@ -0,0 +1,61 @@
+import logging
+import os
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.backends import django
+from django.template.loaders.cached import Loader as CachedLoader
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        with metrics.template_timer():
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    """Шаблоны Django с замером времени отрисовки для метрик."""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+def _project_template_names(backend):
+    for directory in backend.template_dirs:
+        if not directory.startswith(settings.BASE_DIR):
+            continue
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(('.html', '.txt')):
+                    path = os.path.relpath(os.path.join(root, name), directory)
+                    yield path.replace(os.sep, '/')
+
+
+def warm_up():
+    """Компилирует шаблоны проекта в кэш загрузчика при старте воркера.
+
+    Работает только с кэширующим загрузчиком; возвращает число
+    скомпилированных шаблонов.
+    """
+    compiled = 0
+    for backend in engines.all():
+        if not isinstance(backend, django.DjangoTemplates) or not any(
+            isinstance(loader, CachedLoader)
+            for loader in backend.engine.template_loaders
+        ):
+            continue
+        for name in sorted(set(_project_template_names(backend))):
+            try:
+                backend.get_template(name)
+            except TemplateSyntaxError as error:
+                logger.warning('Шаблон %s не скомпилирован: %s', name, error)
+                continue
+            compiled += 1
+    return compiled
@@ -1,6 +1,35 @@
+import os
+import tempfile
+import time
 from http import HTTPStatus
 
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.cache import cache, caches
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from yatube.databases import get_profile
+
+from . import metrics, template_backends
+from .auth_backends import CachedModelBackend
+from .cache import LocalTier, TieredCache
+from .querylog import (NPlusOneDetected, QueryBudgetExceeded,
+                       QueryLogMiddleware, query_budget, query_shape)
+from .ratelimit import Rule
+from .sessions import SessionStore
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +37,416 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(METRICS_SAMPLE_RATE=1)
+    def test_sampled_request_is_measured(self):
+        """Время, SQL-запросы, кэш и шаблоны попадают в гистограммы."""
+        view = 'posts:index'
+        before = metrics.REQUEST_DURATION.count(view)
+        misses = metrics.CACHE_REQUESTS.value(view, 'miss')
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(metrics.REQUEST_DURATION.count(view), before + 1)
+        self.assertGreater(metrics.CACHE_REQUESTS.value(view, 'miss'), misses)
+        hits = metrics.CACHE_REQUESTS.value(view, 'hit')
+        self.client.get(reverse('posts:index'))
+        self.assertGreater(metrics.CACHE_REQUESTS.value(view, 'hit'), hits)
+        body = self.client.get(reverse('metrics')).content.decode()
+        for sample in (
+            'yatube_request_duration_seconds_count{view="posts:index"}',
+            'yatube_db_queries_bucket{view="posts:index",le="+Inf"}',
+            'yatube_template_render_seconds_sum{view="posts:index"}',
+            'yatube_requests_total{view="posts:index",method="GET",'
+            'status="200"}',
+        ):
+            with self.subTest(sample=sample):
+                self.assertIn(sample, body)
+        self.assertNotIn('view="metrics"', body)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_request_is_only_counted(self):
+        view = 'posts:index'
+        before = metrics.REQUEST_DURATION.count(view)
+        requests = metrics.REQUESTS.value(view, 'GET', '200')
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(metrics.REQUEST_DURATION.count(view), before)
+        self.assertEqual(
+            metrics.REQUESTS.value(view, 'GET', '200'), requests + 1
+        )
+
+    def test_metrics_are_private(self):
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='198.51.100.1'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_histogram_format(self):
+        histogram = metrics.Histogram('test_seconds', 'Тест.', ('view',),
+                                      buckets=(0.1, 1))
+        histogram.observe(0.05, 'a')
+        histogram.observe(0.5, 'a')
+        histogram.observe(5, 'a')
+        lines = [
+            f'{name}{labels} {metrics._format_number(value)}'
+            for name, labels, value in histogram.samples()
+        ]
+        self.assertEqual(lines, [
+            'test_seconds_bucket{view="a",le="0.1"} 1',
+            'test_seconds_bucket{view="a",le="1"} 2',
+            'test_seconds_bucket{view="a",le="+Inf"} 3',
+            'test_seconds_sum{view="a"} 5.55',
+            'test_seconds_count{view="a"} 3',
+        ])
+
+
+class QueryLogTests(TestCase):
+    def setUp(self):
+        for number in range(5):
+            User.objects.create_user(username=f'user{number}')
+        self.request = RequestFactory().get('/')
+
+    def run_view(self, view):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = QueryLogMiddleware(get_response)
+        return middleware(self.request)
+
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 21'),
+            'SELECT * FROM t WHERE id IN (%s, ...) LIMIT N'
+        )
+
+    def test_repeated_queries_point_to_template_line(self):
+        """Повторы запроса одной формы находятся вместе со строкой
+        шаблона, из которой они пришли."""
+        template = engines['django'].from_string(
+            '{% for user in users %}\n'
+            '{{ user.groups.count }}\n'
+            '{% endfor %}'
+        )
+
+        def view(request):
+            return HttpResponse(template.render({'users': User.objects.all()}))
+
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            self.run_view(view)
+        self.assertIn(':2', logs.output[0])
+        self.assertIn('Запрос повторён', logs.output[0])
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaises(NPlusOneDetected):
+                self.run_view(view)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_budget_is_enforced(self):
+        @query_budget(1)
+        def view(request):
+            list(User.objects.all())
+            User.objects.count()
+            return HttpResponse()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            self.run_view(view)
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged(self):
+        def view(request):
+            User.objects.count()
+            return HttpResponse()
+
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            self.run_view(view)
+        self.assertIn('Медленный запрос', logs.output[0])
+        self.assertIn('core/tests.py', logs.output[0])
+
+    @override_settings(NPLUSONE_SAMPLE_RATE=0)
+    def test_shapes_are_sampled(self):
+        """Вне выборки SQL не нормализуется, в строгом режиме —
+        всегда."""
+        def view(request):
+            User.objects.count()
+            return HttpResponse()
+
+        with mock.patch('core.querylog.query_shape') as shape:
+            self.run_view(view)
+            shape.assert_not_called()
+            with override_settings(QUERY_BUDGET_STRICT=True):
+                self.run_view(view)
+            shape.assert_called()
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_pragmas_are_applied(self):
+        """Соединение SQLite настраивается прагмами профиля."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_postgresql_profile_uses_pooler(self):
+        profile = get_profile('postgresql', '/tmp')
+        self.assertGreater(profile['CONN_MAX_AGE'], 0)
+        self.assertTrue(profile['DISABLE_SERVER_SIDE_CURSORS'])
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            get_profile('oracle', '/tmp')
+
+
+class TemplateWarmUpTests(TestCase):
+    def cached_templates(self, loaders):
+        templates = [dict(settings.TEMPLATES[0])]
+        templates[0]['OPTIONS'] = dict(
+            templates[0]['OPTIONS'], loaders=loaders
+        )
+        return override_settings(TEMPLATES=templates)
+
+    def test_project_templates_are_precompiled(self):
+        """Прогрев кладёт шаблоны проекта в кэш загрузчика."""
+        with self.cached_templates([(
+            'django.template.loaders.cached.Loader',
+            settings.TEMPLATE_LOADERS
+        )]):
+            self.assertGreater(template_backends.warm_up(), 0)
+            loader = engines['django'].engine.template_loaders[0]
+            for name in ('base.html', 'includes/header.html',
+                         'posts/includes/paginator.html'):
+                with self.subTest(name=name):
+                    self.assertIn(name, loader.get_template_cache)
+            self.assertNotIn('admin/base.html', loader.get_template_cache)
+
+    def test_without_cached_loader_nothing_is_compiled(self):
+        with self.cached_templates(settings.TEMPLATE_LOADERS):
+            self.assertEqual(template_backends.warm_up(), 0)
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_refills_over_time(self):
+        rule = Rule('60/m', burst=2)
+        self.assertEqual(rule.take('bucket', now=100), 0)
+        self.assertEqual(rule.take('bucket', now=100), 0)
+        self.assertAlmostEqual(rule.take('bucket', now=100), 1)
+        self.assertEqual(rule.take('bucket', now=101.5), 0)
+
+    def test_decorated_view_is_limited_per_user(self):
+        """Сверх ведра представление отвечает 429 с Retry-After, каждый
+        пользователь расходует своё ведро, отказы видны в метриках."""
+        author = User.objects.create_user(username='author')
+        url = reverse('posts:profile_follow', args=[author.username])
+        limited = metrics.RATELIMIT_CHECKS.value(
+            'posts:profile_follow', 'limited'
+        )
+        with override_settings(RATELIMITS={
+            'posts:profile_follow': {'rate': '1/h', 'methods': None},
+        }):
+            for username in ('first', 'second'):
+                self.client.force_login(
+                    User.objects.create_user(username=username)
+                )
+                self.assertEqual(self.client.get(url).status_code, 302)
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 3000)
+        self.assertEqual(metrics.RATELIMIT_CHECKS.value(
+            'posts:profile_follow', 'limited'
+        ), limited + 1)
+
+    def test_middleware_limits_login_by_ip(self):
+        url = reverse('users:login')
+        with override_settings(RATELIMITS={
+            'users:login': {'rate': '2/m', 'key': 'ip'},
+        }):
+            self.assertEqual(self.client.get(url).status_code, 200)
+            statuses = [
+                self.client.post(url, {'username': 'x', 'password': 'y'})
+                .status_code for _ in range(3)
+            ]
+        self.assertEqual(statuses, [200, 200, 429])
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overridden = override_settings(CACHES={
+            'default': {'BACKEND': 'core.cache.MeteredLocMemCache'},
+            'shared': {
+                'BACKEND': 'core.cache.SQLiteCache',
+                'LOCATION': os.path.join(directory.name, 'cache.sqlite3'),
+            },
+        })
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.shared = caches['shared']
+
+    def process(self, name, **options):
+        """Двухуровневый кэш с собственным L1, как в другом процессе."""
+        return TieredCache(f'{self.id()}.{name}', {'OPTIONS': {
+            'L2': 'shared', 'SYNC_INTERVAL': 0, **options
+        }})
+
+    def test_sqlite_cache_operations(self):
+        self.assertTrue(self.shared.add('lock', 1, 10))
+        self.assertFalse(self.shared.add('lock', 2, 10))
+        self.shared.set('counter', 1, None)
+        self.assertEqual(self.shared.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.shared.incr('missing')
+        self.shared.set('expired', 1, -1)
+        self.assertTrue(self.shared.add('expired', 2))
+        self.assertEqual(
+            self.shared.get_many(['lock', 'counter', 'none']),
+            {'lock': 1, 'counter': 6}
+        )
+        self.assertTrue(self.shared.delete('lock'))
+        self.assertIsNone(self.shared.get('lock'))
+
+    def test_writes_invalidate_other_processes(self):
+        """Значение читается из L1, а запись в одном процессе
+        выбрасывает его из L1 другого."""
+        first, second = self.process('first'), self.process('second')
+        first.set('page', 'старая')
+        self.assertEqual(second.get('page'), 'старая')
+        self.shared.delete('page')
+        self.assertEqual(second.get('page'), 'старая')
+        first.set('page', 'новая')
+        self.assertEqual(second.get('page'), 'новая')
+        self.assertTrue(first.add('page_version', 1))
+        self.assertEqual(second.get('page_version'), 1)
+        first.incr('page_version')
+        self.assertEqual(second.get('page_version'), 2)
+        first.delete('page')
+        self.assertIsNone(second.get('page'))
+
+    def test_local_copy_expires_with_shared_value(self):
+        """Копия в L1 другого процесса живёт не дольше записи в L2,
+        а счётчик со сроком по-прежнему увеличивается."""
+        first, second = self.process('first'), self.process('second')
+        first.set('session', 'данные', 0.05)
+        first.add('counter', 1, 0.05)
+        self.assertEqual(second.get('session'), 'данные')
+        self.assertEqual(second.get('counter'), 1)
+        self.assertEqual(second.incr('counter'), 2)
+        time.sleep(0.1)
+        self.assertIsNone(second.get('session'))
+        self.assertIsNone(second.get('counter'))
+
+    def test_lost_messages_clear_local_tier(self):
+        first, second = self.process('first'), self.process('second')
+        first.set('key', 1)
+        second.get('key')
+        first.set('key', 2)
+        self.shared.delete(TieredCache.MESSAGE_KEY.format(2))
+        self.assertEqual(second.get('key'), 2)
+        self.assertEqual(len(second.l1.entries), 1)
+
+    def test_local_tier_evicts_least_recent_and_expired(self):
+        tier = LocalTier(max_entries=2, max_bytes=10)
+        tier.set('a', b'1', 60)
+        tier.set('b', b'2', 60)
+        tier.get('a')
+        tier.set('c', b'3', 60)
+        self.assertEqual(list(tier.entries), ['a', 'c'])
+        tier.set('big', b'x' * 10, 60)
+        self.assertEqual(list(tier.entries), ['big'])
+        tier.set('short', b'1', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(tier.get('short'))
+
+
+class SessionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+
+    def test_logged_in_request_skips_session_and_user_queries(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('about:author'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('about:author'))
+        self.assertEqual(response.context['user'], self.user)
+        self.assertEqual(len(queries), 0, [q['sql'] for q in queries])
+
+    def test_unchanged_session_is_not_saved(self):
+        session = SessionStore()
+        session['theme'] = 'dark'
+        session.create()
+        loaded = SessionStore(session.session_key)
+        loaded['theme'] = 'dark'
+        with self.assertNumQueries(0):
+            loaded.save()
+        loaded['theme'] = 'light'
+        loaded.save()
+        cache.clear()
+        self.assertEqual(
+            SessionStore(session.session_key)['theme'], 'light'
+        )
+
+    def test_user_save_invalidates_cached_user(self):
+        backend = CachedModelBackend()
+        self.assertEqual(backend.get_user(self.user.pk).first_name, '')
+        self.user.first_name = 'Анна'
+        self.user.save()
+        with self.assertNumQueries(1):
+            user = backend.get_user(self.user.pk)
+        self.assertEqual(user.first_name, 'Анна')
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(backend.get_user(self.user.pk))
+
+    def test_sessions_of_model_backend_stay_logged_in(self):
+        self.client.force_login(
+            self.user, backend='django.contrib.auth.backends.ModelBackend'
+        )
+        response = self.client.get(reverse('about:author'))
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_failed_login_hashes_once(self):
+        """Неверный пароль и неизвестный пользователь проверяются
+        хешером один раз, как и верный пароль."""
+        self.user.set_password('верный пароль')
+        self.user.save()
+        credentials = (
+            ('верный пароль', self.user.username),
+            ('неверный пароль', self.user.username),
+            ('неверный пароль', 'нет такого'),
+        )
+        for password, username in credentials:
+            with self.subTest(username=username, password=password):
+                with mock.patch(
+                    'django.contrib.auth.base_user.check_password',
+                    wraps=check_password
+                ) as check, mock.patch(
+                    'django.contrib.auth.base_user.make_password',
+                    wraps=make_password
+                ) as make:
+                    authenticate(username=username, password=password)
+                self.assertEqual(check.call_count + make.call_count, 1)
+
+    def test_purge_sessions_in_batches(self):
+        expired = timezone.now() - timedelta(days=1)
+        for number in range(5):
+            Session.objects.create(
+                session_key=f'expired{number}', session_data='',
+                expire_date=expired
+            )
+        Session.objects.create(
+            session_key='alive', session_data='',
+            expire_date=timezone.now() + timedelta(days=1)
+        )
+        with open(os.devnull, 'w') as devnull:
+            call_command('purge_sessions', batch_size=2, stdout=devnull)
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['alive']
+        )
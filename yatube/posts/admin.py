@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.safestring import mark_safe
 
 from .models import Group, Post, Comment, Follow
+from .search import search_comments, search_posts
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -19,6 +20,11 @@ class PostAdmin(admin.ModelAdmin):
     
     get_html_image.short_description = 'Изображение'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search_posts(search_term)), False
+
 
 admin.site.register(Post, PostAdmin)
 
@@ -36,6 +42,11 @@ class CommentAdmin(admin.ModelAdmin):
     list_filter = ('post',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search_comments(search_term)), False
+
 
 admin.site.register(Comment, CommentAdmin)
 
@@ -0,0 +1,189 @@
+"""Замеры страниц приложения posts через тестовый клиент.
+
+Каждая страница из ``posts.urls`` запрашивается несколько раз, для неё
+считаются перцентили времени ответа, среднее число SQL-запросов и
+пропускная способность. Результаты можно сохранить как базовую линию
+и сравнивать с ней следующие прогоны.
+"""
+import json
+import math
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count
+from django.template.loader import get_template
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from yatube.settings import POSTS_NUMBER
+
+from . import urls
+from .models import Group, Post, User
+
+PAGINATOR_PAGE_COUNTS = (10, 1000, 100000)
+# Представления, которые меняют данные при GET-запросе.
+SKIPPED_URLS = ('add_comment', 'profile_follow', 'profile_unfollow')
+# Адрес не из INTERNAL_IPS: панель отладки не должна попадать в замеры.
+CLIENT_ADDRESS = '198.51.100.1'
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def sample_kwargs(user=None):
+    """Аргументы адресов: самые нагруженные группа, автор и пост."""
+    post = None
+    if user is not None:
+        post = user.posts.order_by('-comments_count', '-pub_date').first()
+    if post is None:
+        post = Post.objects.order_by('-comments_count', '-pub_date').first()
+    group = Group.objects.order_by('-posts_count').first()
+    if post is None or group is None:
+        raise BenchmarkError('Нет данных: запустите generate_data.')
+    return {
+        'post_id': post.pk,
+        'slug': group.slug,
+        'username': post.author.username,
+    }
+
+
+def default_user():
+    """Читатель с самой длинной лентой подписок."""
+    return User.objects.annotate(
+        following_total=Count('follower')
+    ).order_by('-following_total', 'pk').first()
+
+
+def targets(user=None, names=None):
+    """Пары «имя адреса — путь» для всех страниц ``posts.urls``."""
+    kwargs = sample_kwargs(user)
+    result = []
+    for pattern in urls.urlpatterns:
+        if pattern.name in SKIPPED_URLS:
+            continue
+        if names and pattern.name not in names:
+            continue
+        arguments = {
+            name: kwargs[name] for name in pattern.pattern.converters
+        }
+        result.append((pattern.name, reverse(
+            f'{urls.app_name}:{pattern.name}', kwargs=arguments
+        )))
+    return result
+
+
+def measure(client, path, requests, warmup=0, cold=False):
+    for _ in range(warmup):
+        client.get(path)
+    timings = []
+    queries = 0
+    status = None
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(path)
+            timings.append(time.perf_counter() - start)
+        queries += len(captured)
+        status = response.status_code
+    total = sum(timings)
+    return {
+        'path': path,
+        'status': status,
+        'requests': requests,
+        'p50': percentile(timings, 0.5) * 1000,
+        'p95': percentile(timings, 0.95) * 1000,
+        'p99': percentile(timings, 0.99) * 1000,
+        'queries': queries / requests,
+        'throughput': requests / total if total else 0.0,
+    }
+
+
+def run(requests=50, warmup=5, cold=False, user=None, names=None):
+    """Результаты замеров по имени адреса."""
+    if requests < 1:
+        raise BenchmarkError('Нужен хотя бы один запрос на страницу.')
+    client = Client(REMOTE_ADDR=CLIENT_ADDRESS)
+    user = user or default_user()
+    if user is not None:
+        client.force_login(user)
+    return {
+        name: measure(client, path, requests, warmup, cold)
+        for name, path in targets(user, names)
+    }
+
+
+def paginator_render(page_counts=PAGINATOR_PAGE_COUNTS, repeats=50):
+    """Медиана отрисовки пагинатора на средней странице ленты
+    из ``pages`` страниц: время и размер разметки не должны расти."""
+    template = get_template('posts/includes/paginator.html')
+    request = RequestFactory().get('/')
+    results = {}
+    for pages in page_counts:
+        paginator = Paginator(range(pages * POSTS_NUMBER), POSTS_NUMBER)
+        context = {
+            'page_obj': paginator.get_page(pages // 2 + 1),
+            'request': request,
+        }
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            html = template.render(context, request)
+            timings.append(time.perf_counter() - start)
+        results[pages] = {
+            'p50': percentile(timings, 0.5) * 1000,
+            'links': html.count('<li'),
+        }
+    return results
+
+
+def baseline_path(name):
+    return os.path.join(settings.BENCHMARK_DIR, f'{name}.json')
+
+
+def save_baseline(name, results):
+    os.makedirs(settings.BENCHMARK_DIR, exist_ok=True)
+    with open(baseline_path(name), 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+def load_baseline(name):
+    try:
+        with open(baseline_path(name), encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        raise BenchmarkError(f'Базовая линия {name} не найдена.')
+
+
+def compare(baseline, results, tolerance):
+    """Регрессии: рост p95 больше чем на ``tolerance`` или лишние
+    SQL-запросы."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['p95'] > previous['p95'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {previous["p95"]:.1f} → '
+                f'{current["p95"]:.1f} мс'
+            )
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: запросов {previous["queries"]:g} → '
+                f'{current["queries"]:g}'
+            )
+    return regressions
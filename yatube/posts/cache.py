@@ -0,0 +1,142 @@
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+
+FEED_VERSION_KEY = 'posts:feed_version'
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _initial_version():
+    # Версия от текущего времени: если ключ вытеснят из кэша, счётчик
+    # не начнётся заново и не воскресит страницы со старой версией.
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_versions(keys):
+    """Версии нескольких ключей за одно обращение к кэшу."""
+    versions = cache.get_many(keys)
+    missing = {
+        key: _initial_version() for key in keys if key not in versions
+    }
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return versions
+
+
+def bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, None)
+        return version
+
+
+def post_version_key(post_id):
+    return f'posts:post_version:{post_id}'
+
+
+def user_version_key(user_id):
+    return f'posts:user_version:{user_id}'
+
+
+def group_version_key(group_id):
+    return f'posts:group_version:{group_id}'
+
+
+def comments_version_key(post_id):
+    return f'posts:comments_version:{post_id}'
+
+
+def card_cache_keys(posts):
+    """Ключи карточек постов по версиям поста, автора и группы."""
+    sources = {
+        post.pk: (
+            post_version_key(post.pk),
+            user_version_key(post.author_id),
+            group_version_key(post.group_id or 0),
+        )
+        for post in posts
+    }
+    versions = get_versions(
+        {key for keys in sources.values() for key in keys}
+    )
+    return {
+        post_id: 'posts:card:{}:{}:{}:{}'.format(
+            post_id, *(versions[key] for key in keys)
+        )
+        for post_id, keys in sources.items()
+    }
+
+
+def page_cache_key(request, key_prefix, version_key=FEED_VERSION_KEY):
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    path = md5(request.get_full_path().encode()).hexdigest()
+    version = get_version(version_key)
+    return f'{key_prefix}:{version}:{user_id}:{path}'
+
+
+def _wait_for(key, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        response = cache.get(key)
+        if response is not None:
+            return response
+    return None
+
+
+def cache_feed_page(key_prefix, version_key=FEED_VERSION_KEY):
+    """Кэширует страницу до смены версии ленты.
+
+    Версию увеличивают сигналы при изменении постов, групп и
+    комментариев, поэтому новая запись видна сразу; страницы старых
+    версий истекают через ``FEED_PAGE_CACHE_TIMEOUT``. Пересобирает
+    страницу только тот запрос, который первым взял блокировку,
+    остальные ждут готовый результат.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = page_cache_key(request, key_prefix, version_key)
+            response = cache.get(key)
+            if response is not None:
+                return response
+            lock_key = f'{key}:lock'
+            lock_timeout = settings.CACHE_REBUILD_LOCK_TIMEOUT
+            locked = cache.add(lock_key, 1, lock_timeout)
+            if not locked:
+                response = _wait_for(key, lock_timeout)
+                if response is not None:
+                    return response
+            try:
+                response = view(request, *args, **kwargs)
+                if (
+                    response.status_code == 200
+                    and not response.streaming
+                    and not response.cookies
+                ):
+                    cache.set(
+                        key, response, settings.FEED_PAGE_CACHE_TIMEOUT
+                    )
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
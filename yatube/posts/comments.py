@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .cache import (comments_version_key, get_version, get_versions,
+                    user_version_key)
+from .models import Comment
+from .utils import COMMENT_ORDERING, KeysetPaginator
+
+
+def get_page(post_id, cursor=None, strict=False):
+    """Страница комментариев поста, новые сверху."""
+    comments = Comment.objects.filter(post_id=post_id).with_authors()
+    return KeysetPaginator(
+        comments, settings.COMMENTS_NUMBER, COMMENT_ORDERING
+    ).get_page(cursor, strict)
+
+
+def render_page(post_id, page):
+    return mark_safe(render_to_string('posts/includes/comment_list.html', {
+        'post_id': post_id,
+        'comments': page,
+    }))
+
+
+def first_page_key(post_id):
+    version = get_version(comments_version_key(post_id))
+    return f'posts:first_comments:{post_id}:{version}'
+
+
+def first_page(post_id):
+    """Разметка первой страницы комментариев из кэша.
+
+    Версию фрагмента увеличивает каждый новый или удалённый
+    комментарий. Вместе с разметкой хранятся версии авторов, поэтому
+    смена имени любого из них тоже пересобирает фрагмент. Фрагменты
+    старых версий истекают через ``COMMENTS_CACHE_TIMEOUT``.
+    """
+    key = first_page_key(post_id)
+    cached = cache.get(key)
+    if cached is not None:
+        html, authors = cached
+        if get_versions(list(authors)) == authors:
+            return mark_safe(html)
+    page = get_page(post_id)
+    html = render_page(post_id, page)
+    authors = get_versions(
+        {user_version_key(comment.author_id) for comment in page}
+    )
+    cache.set(
+        key, (str(html), authors), settings.COMMENTS_CACHE_TIMEOUT
+    )
+    return html
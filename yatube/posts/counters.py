@@ -0,0 +1,74 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    if user_id is None:
+        return
+    stats = UserStats.objects.filter(user_id=user_id)
+    if _change(stats, field, delta) or delta < 0 or stats.exists():
+        return
+    if User.objects.filter(pk=user_id).exists():
+        UserStats.objects.create(user_id=user_id)
+        reconcile_users(UserStats.objects.filter(user_id=user_id))
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post(post_id, delta):
+    if post_id is not None:
+        _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def _reconcile(queryset, field, actual):
+    return queryset.exclude(**{field: actual}).update(**{field: actual})
+
+
+def reconcile_users(queryset=None):
+    if queryset is None:
+        UserStats.objects.bulk_create(
+            (UserStats(user_id=user_id) for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)),
+            batch_size=500,
+        )
+        queryset = UserStats.objects.all()
+    return sum((
+        _reconcile(queryset, 'posts_count', _count(Post, 'author')),
+        _reconcile(queryset, 'followers_count', _count(Follow, 'author')),
+        _reconcile(queryset, 'following_count', _count(Follow, 'user')),
+    ))
+
+
+def reconcile():
+    """Пересчитывает все счётчики, возвращает число исправленных полей."""
+    return {
+        'users': reconcile_users(),
+        'groups': _reconcile(
+            Group.objects.all(), 'posts_count', _count(Post, 'group')
+        ),
+        'posts': _reconcile(
+            Post.objects.all(), 'comments_count', _count(Comment, 'post')
+        ),
+    }
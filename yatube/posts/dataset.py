@@ -0,0 +1,223 @@
+"""Синтетические данные для нагрузочного тестирования.
+
+Популярность авторов распределена по степенному закону: немногие
+авторы собирают большую часть подписчиков, постов и комментариев,
+как в настоящей соцсети. Всё пишется пачками через ``bulk_create``
+в обход сигналов, поэтому в конце пересчитываются счётчики, ленты
+и поисковый индекс.
+"""
+import bisect
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from . import counters, follow_graph, search, timeline
+from .cache import FEED_VERSION_KEY, bump_version
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+PASSWORD = 'benchmark'
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+@contextmanager
+def manual_dates(model, *names):
+    """Отключает ``auto_now``/``auto_now_add``, чтобы задать даты самим."""
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def rebuild_derived(log):
+    """Приводит в порядок всё, что обычно поддерживают сигналы:
+    нужно после записи в обход них через ``bulk_create``."""
+    counters.reconcile()
+    log('Счётчики пересчитаны')
+    timeline.rebuild()
+    log('Ленты пересобраны')
+    search.rebuild()
+    log('Поисковый индекс перестроен')
+    bump_version(FEED_VERSION_KEY)
+    # Подписки записаны мимо журнала: новая версия без записи в нём
+    # заставляет графы всех процессов загрузиться заново.
+    bump_version(follow_graph.VERSION_KEY)
+
+
+class PowerLaw:
+    """Выбор элементов с весом ``1 / rank ** exponent``."""
+
+    def __init__(self, items, exponent, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cumulative = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+        self.rng = rng
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def choice(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return self.items[bisect.bisect(self.cumulative, point)]
+
+
+class DatasetGenerator:
+    def __init__(self, seed=None, exponent=1.1, days=365,
+                 batch_size=BATCH_SIZE, log=None):
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.exponent = exponent
+        self.days = days
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def _date(self):
+        return self.now - timedelta(seconds=self.rng.randrange(
+            self.days * 24 * 60 * 60
+        ))
+
+    def _popular(self, items):
+        return PowerLaw(items, self.exponent, self.rng)
+
+    def _insert(self, model, objects, **kwargs):
+        created = 0
+        for batch in _batched(objects, self.batch_size):
+            model.objects.bulk_create(batch, **kwargs)
+            created += len(batch)
+        self.log(f'{model._meta.verbose_name_plural}: {created}')
+        return created
+
+    def users(self, count, prefix='user'):
+        start = User.objects.count()
+        password = make_password(PASSWORD)
+        self._insert(User, (
+            User(
+                username=f'{prefix}{number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for number in range(start, start + count)
+        ), ignore_conflicts=True)
+
+    def groups(self, count):
+        start = Group.objects.count()
+        self._insert(Group, (
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'group-{number}',
+                description=self.fake.paragraph(),
+            )
+            for number in range(start, start + count)
+        ), ignore_conflicts=True)
+
+    def images(self, count):
+        """Сохраняет ``count`` однотонных картинок, возвращает их имена."""
+        names = []
+        for number in range(count):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', (640, 480), color).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/generated_{number}.jpg',
+                ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def posts(self, count, image_names=(), image_ratio=0.0,
+              group_ratio=0.5):
+        authors = self._popular(User.objects.values_list('pk', flat=True))
+        groups = self._popular(Group.objects.values_list('pk', flat=True))
+        if not authors:
+            return 0
+
+        def build():
+            for _ in range(count):
+                image = ''
+                if image_names and self.rng.random() < image_ratio:
+                    image = self.rng.choice(image_names)
+                group = None
+                if groups and self.rng.random() < group_ratio:
+                    group = groups.choice()
+                date = self._date()
+                yield Post(
+                    author_id=authors.choice(),
+                    group_id=group,
+                    text=self.fake.paragraph(nb_sentences=4),
+                    image=image,
+                    pub_date=date,
+                    updated=date,
+                )
+
+        with manual_dates(Post, 'pub_date', 'updated'):
+            return self._insert(Post, build())
+
+    def comments(self, count):
+        posts = self._popular(Post.objects.values_list('pk', flat=True))
+        users = list(User.objects.values_list('pk', flat=True))
+        if not posts or not users:
+            return 0
+        with manual_dates(Comment, 'created'):
+            return self._insert(Comment, (
+                Comment(
+                    post_id=posts.choice(),
+                    author_id=self.rng.choice(users),
+                    text=self.fake.sentence(),
+                    created=self._date(),
+                )
+                for _ in range(count)
+            ))
+
+    def follows(self, per_user):
+        """Подписки: в среднем ``per_user`` на читателя, авторы —
+        по степенному закону, поэтому у лидеров тысячи подписчиков."""
+        users = list(User.objects.values_list('pk', flat=True))
+        authors = self._popular(users)
+        if len(users) < 2 or per_user <= 0:
+            return 0
+        limit = len(users) - 1
+
+        def build():
+            for user in users:
+                wanted = min(
+                    int(self.rng.expovariate(1 / per_user)) + 1, limit
+                )
+                chosen = set()
+                for _ in range(wanted * 3):
+                    if len(chosen) >= wanted:
+                        break
+                    author = authors.choice()
+                    if author != user:
+                        chosen.add(author)
+                for author in chosen:
+                    yield Follow(user_id=user, author_id=author)
+
+        return self._insert(Follow, build(), ignore_conflicts=True)
+
+    def finish(self):
+        rebuild_derived(self.log)
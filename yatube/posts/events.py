@@ -0,0 +1,184 @@
+"""Уведомления открытых лент о новых постах (Server-Sent Events).
+
+Сохранение поста публикуется в брокер в памяти процесса по каналам:
+общая лента, группа и автор. Соединение ленты подписок слушает каналы
+всех авторов, на которых подписан читатель. Подписка — это счётчик и
+``asyncio.Event``, поэтому простаивающее соединение почти ничего не
+стоит, а посты, пришедшие, пока соединение не проснулось,
+складываются в одно событие.
+
+Клиент получает событие ``posts`` с числом новых постов с момента
+подключения. Брокер видит только посты, сохранённые в этом же
+процессе, поэтому ASGI-воркер (``yatube/asgi.py``) обслуживает и
+обычные страницы, а не только потоки событий. Потоки живут под адресом
+``EVENTS_URL``; при WSGI он пуст, и страницы их не запрашивают.
+"""
+import asyncio
+import json
+import re
+import threading
+from collections import defaultdict
+from importlib import import_module
+from types import SimpleNamespace
+
+from core.asgi import event_stream, header, respond, run_sync
+from django.conf import settings
+from django.contrib import auth
+from django.http.cookie import parse_cookie
+
+from . import follow_graph
+from .models import Group
+
+ALL_CHANNEL = 'feed:all'
+
+
+def group_channel(group_id):
+    return f'feed:group:{group_id}'
+
+
+def author_channel(author_id):
+    return f'feed:author:{author_id}'
+
+
+class Subscription:
+    def __init__(self, broker, channels, loop):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self.loop = loop
+        self.count = 0
+        self.changed = asyncio.Event()
+
+    def add(self, count):
+        self.count += count
+        self.changed.set()
+
+    async def wait(self, timeout):
+        """Ждёт новых постов не дольше ``timeout`` секунд."""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.changed.clear()
+        return True
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Публикация из любого потока, подписчики — в цикле событий."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = defaultdict(set)
+
+    def subscribe(self, channels):
+        subscription = Subscription(
+            self, channels, asyncio.get_running_loop()
+        )
+        with self.lock:
+            for channel in subscription.channels:
+                self.channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[channel]
+
+    def publish(self, channels, count=1):
+        with self.lock:
+            subscribers = set().union(*(
+                self.channels.get(channel, ()) for channel in channels
+            ))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.add, count)
+
+    def subscribers(self):
+        with self.lock:
+            return len(set().union(*self.channels.values()))
+
+
+broker = Broker()
+
+
+def publish_post(post):
+    channels = [ALL_CHANNEL, author_channel(post.author_id)]
+    if post.group_id is not None:
+        channels.append(group_channel(post.group_id))
+    broker.publish(channels)
+
+
+def event(name, data):
+    payload = json.dumps(data, ensure_ascii=False)
+    return f'event: {name}\ndata: {payload}\n\n'.encode()
+
+
+async def stream(channels):
+    """События ``posts`` с числом новых постов и комментарии-пинги,
+    по которым прокси не закрывают простаивающее соединение."""
+    subscription = broker.subscribe(channels)
+    try:
+        yield b'retry: 5000\n\n'
+        while True:
+            if await subscription.wait(settings.EVENTS_HEARTBEAT):
+                yield event('posts', {'count': subscription.count})
+            else:
+                yield b': ping\n\n'
+    finally:
+        subscription.close()
+
+
+def session_user(scope):
+    cookies = parse_cookie(header(scope, b'cookie') or '')
+    engine = import_module(settings.SESSION_ENGINE)
+    request = SimpleNamespace(session=engine.SessionStore(
+        cookies.get(settings.SESSION_COOKIE_NAME)
+    ))
+    return auth.get_user(request)
+
+
+def followed_authors(scope):
+    user = session_user(scope)
+    if not user.is_authenticated:
+        return None
+    return follow_graph.following(user.pk)
+
+
+async def feed_events(scope, receive, send):
+    await event_stream(receive, send, stream([ALL_CHANNEL]))
+
+
+async def group_events(scope, receive, send, slug):
+    group_id = await run_sync(
+        lambda: Group.objects.filter(slug=slug).values_list(
+            'id', flat=True
+        ).first()
+    )
+    if group_id is None:
+        return await respond(send, 404, 'Группа не найдена'.encode())
+    await event_stream(receive, send, stream([group_channel(group_id)]))
+
+
+async def follow_events(scope, receive, send):
+    authors = await run_sync(followed_authors, scope)
+    if authors is None:
+        return await respond(send, 401, 'Требуется авторизация'.encode())
+    await event_stream(
+        receive, send, stream([author_channel(pk) for pk in authors])
+    )
+
+
+def routes(prefix):
+    """Маршруты потоков событий под адресом ``prefix``."""
+    prefix = re.escape(prefix)
+    return [
+        (rf'^{prefix}feed/$', feed_events),
+        (rf'^{prefix}group/(?P<slug>[-\w]+)/$', group_events),
+        (rf'^{prefix}follow/$', follow_events),
+    ]
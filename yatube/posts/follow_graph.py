@@ -0,0 +1,293 @@
+"""Граф подписок в памяти процесса.
+
+Для каждого пользователя хранятся отсортированные массивы ``array('i')``
+id авторов, на которых он подписан, и id его подписчиков: четыре байта
+на связь вместо объекта на строку ``Follow``. Проверка подписки — это
+двоичный поиск, взаимные подписки — слияние двух массивов, и всё это
+без запросов к базе.
+
+Граф загружается из ``Follow`` при первом обращении. Каждая подписка и
+отписка после коммита попадает в журнал в общем кэше под следующим
+номером версии ``VERSION_KEY`` (posts.signals). Перед ответом граф
+сверяет свою версию с кэшем и применяет пропущенные записи журнала, а
+если их не хватает — загружается заново. С кэшем в памяти процесса
+(профиль ``local``) журнал других процессов не виден, поэтому граф
+загружается заново не реже раза в ``LOCAL_RELOAD_INTERVAL`` секунд.
+Внутри транзакции ответы дают запросы к ``Follow`` по индексам: граф в
+памяти не видит её изменений, а изменения, которые откатятся, в него
+попасть не должны.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from core.cache import is_process_local
+from django.core.cache import cache, caches
+from django.db import connection
+
+from .cache import bump_version, get_version
+from .models import Follow
+
+VERSION_KEY = 'posts:follow_graph_version'
+FOLLOW = 'follow'
+UNFOLLOW = 'unfollow'
+# Сколько записей журнала процесс может догнать, не загружая граф
+# заново, и сколько секунд они хранятся.
+JOURNAL_SIZE = 1000
+JOURNAL_TIMEOUT = 60 * 60
+# Как часто граф перечитывается, если кэш не общий для процессов.
+LOCAL_RELOAD_INTERVAL = 60
+BATCH_SIZE = 2000
+
+_EMPTY = array('i')
+
+
+def change_key(version):
+    return f'posts:follow_graph_change:{version}'
+
+
+def record(change, user_id, author_id):
+    """Записывает подписку или отписку в журнал графа."""
+    version = bump_version(VERSION_KEY)
+    cache.set(
+        change_key(version), (change, user_id, author_id), JOURNAL_TIMEOUT
+    )
+
+
+def _find(ids, value):
+    position = bisect_left(ids, value)
+    return position, position < len(ids) and ids[position] == value
+
+
+def _add(index, key, value):
+    ids = index.setdefault(key, array('i'))
+    position, found = _find(ids, value)
+    if not found:
+        ids.insert(position, value)
+
+
+def _remove(index, key, value):
+    ids = index.get(key)
+    if ids is None:
+        return
+    position, found = _find(ids, value)
+    if found:
+        del ids[position]
+        if not ids:
+            del index[key]
+
+
+def _intersect(left, right):
+    """Общие элементы двух отсортированных массивов."""
+    common = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i] < right[j]:
+            i += 1
+        elif left[i] > right[j]:
+            j += 1
+        else:
+            common.append(left[i])
+            i += 1
+            j += 1
+    return common
+
+
+class Adjacency:
+    """Подписки и подписчики: id пользователя → отсортированный массив."""
+
+    def __init__(self):
+        self.following_ids = {}
+        self.follower_ids = {}
+
+    @classmethod
+    def load(cls):
+        adjacency = cls()
+        # В порядке (user, author) по уникальному индексу подписок оба
+        # массива сразу получаются отсортированными.
+        pairs = Follow.objects.order_by(
+            'user_id', 'author_id'
+        ).values_list('user_id', 'author_id')
+        for user_id, author_id in pairs.iterator(chunk_size=BATCH_SIZE):
+            adjacency.following_ids.setdefault(
+                user_id, array('i')
+            ).append(author_id)
+            adjacency.follower_ids.setdefault(
+                author_id, array('i')
+            ).append(user_id)
+        return adjacency
+
+    def apply(self, change, user_id, author_id):
+        if change == FOLLOW:
+            _add(self.following_ids, user_id, author_id)
+            _add(self.follower_ids, author_id, user_id)
+        else:
+            _remove(self.following_ids, user_id, author_id)
+            _remove(self.follower_ids, author_id, user_id)
+
+    def is_following(self, user_id, author_id):
+        return _find(self.following_ids.get(user_id, _EMPTY), author_id)[1]
+
+    def following_any(self, user_id, author_ids):
+        following = self.following_ids.get(user_id, _EMPTY)
+        return {
+            author_id for author_id in author_ids
+            if _find(following, author_id)[1]
+        }
+
+    def following(self, user_id):
+        return list(self.following_ids.get(user_id, _EMPTY))
+
+    def followers(self, author_id):
+        return list(self.follower_ids.get(author_id, _EMPTY))
+
+    def mutuals(self, user_id):
+        return _intersect(
+            self.following_ids.get(user_id, _EMPTY),
+            self.follower_ids.get(user_id, _EMPTY),
+        )
+
+    def following_count(self, user_id):
+        return len(self.following_ids.get(user_id, _EMPTY))
+
+    def followers_count(self, author_id):
+        return len(self.follower_ids.get(author_id, _EMPTY))
+
+
+class FollowTable:
+    """Те же ответы запросами к ``Follow`` по его индексам: внутри
+    транзакции граф в памяти может не видеть её изменений."""
+
+    def is_following(self, user_id, author_id):
+        return Follow.objects.filter(
+            user_id=user_id, author_id=author_id
+        ).exists()
+
+    def following_any(self, user_id, author_ids):
+        return set(Follow.objects.filter(
+            user_id=user_id, author_id__in=list(author_ids)
+        ).values_list('author_id', flat=True))
+
+    def following(self, user_id):
+        return list(Follow.objects.filter(user_id=user_id).order_by(
+            'author_id'
+        ).values_list('author_id', flat=True))
+
+    def followers(self, author_id):
+        return list(Follow.objects.filter(author_id=author_id).order_by(
+            'user_id'
+        ).values_list('user_id', flat=True))
+
+    def mutuals(self, user_id):
+        return list(Follow.objects.filter(
+            user_id=user_id,
+            author_id__in=Follow.objects.filter(
+                author_id=user_id
+            ).values('user_id')
+        ).order_by('author_id').values_list('author_id', flat=True))
+
+    def following_count(self, user_id):
+        return Follow.objects.filter(user_id=user_id).count()
+
+    def followers_count(self, author_id):
+        return Follow.objects.filter(author_id=author_id).count()
+
+
+class FollowGraph:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.adjacency = None
+        self.version = None
+        self.loaded_at = 0
+
+    def reset(self):
+        with self.lock:
+            self.adjacency = None
+            self.version = None
+
+    def _load(self, version):
+        self.adjacency = Adjacency.load()
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def _expired(self):
+        # Журнал в кэше своего процесса не видит чужих подписок: граф
+        # сверяется с базой хотя бы раз в LOCAL_RELOAD_INTERVAL.
+        return (
+            is_process_local(caches['default'])
+            and time.monotonic() - self.loaded_at > LOCAL_RELOAD_INTERVAL
+        )
+
+    def _sync(self, version):
+        if (
+            self.adjacency is not None
+            and 0 < version - self.version <= JOURNAL_SIZE
+        ):
+            keys = [
+                change_key(number)
+                for number in range(self.version + 1, version + 1)
+            ]
+            changes = cache.get_many(keys)
+            if len(changes) == len(keys):
+                for key in keys:
+                    self.adjacency.apply(*changes[key])
+                self.version = version
+                return
+        # Версия загрузки может отставать от базы: записи журнала,
+        # которые применятся к графу повторно, ничего не изменят.
+        self._load(version)
+
+    @contextmanager
+    def snapshot(self):
+        if connection.in_atomic_block:
+            yield FollowTable()
+            return
+        version = get_version(VERSION_KEY)
+        with self.lock:
+            if self.adjacency is not None and self._expired():
+                self._load(version)
+            elif version != self.version:
+                self._sync(version)
+            yield self.adjacency
+
+    def is_following(self, user_id, author_id):
+        with self.snapshot() as source:
+            return source.is_following(user_id, author_id)
+
+    def following_any(self, user_id, author_ids):
+        """Те из ``author_ids``, на кого подписан пользователь."""
+        with self.snapshot() as source:
+            return source.following_any(user_id, author_ids)
+
+    def following(self, user_id):
+        with self.snapshot() as source:
+            return source.following(user_id)
+
+    def followers(self, author_id):
+        with self.snapshot() as source:
+            return source.followers(author_id)
+
+    def mutuals(self, user_id):
+        """Пользователи, с которыми подписка взаимна."""
+        with self.snapshot() as source:
+            return source.mutuals(user_id)
+
+    def following_count(self, user_id):
+        with self.snapshot() as source:
+            return source.following_count(user_id)
+
+    def followers_count(self, author_id):
+        with self.snapshot() as source:
+            return source.followers_count(author_id)
+
+
+graph = FollowGraph()
+is_following = graph.is_following
+following_any = graph.following_any
+following = graph.following
+followers = graph.followers
+mutuals = graph.mutuals
+following_count = graph.following_count
+followers_count = graph.followers_count
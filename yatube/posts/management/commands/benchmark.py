@@ -0,0 +1,99 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+from posts.models import User
+
+ROW = '{:<18} {:>6} {:>9} {:>9} {:>9} {:>8} {:>10}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет страницы posts: p50/p95/p99, SQL-запросы на запрос '
+        'и пропускную способность.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--url', action='append', dest='names',
+            help='Замерить только этот адрес (имя из posts.urls).'
+        )
+        parser.add_argument(
+            '--user', help='Пользователь, от имени которого идут запросы.'
+        )
+        parser.add_argument(
+            '--paginator', action='store_true',
+            help='Замерить отрисовку пагинатора при росте числа страниц.'
+        )
+        parser.add_argument('--save', help='Сохранить базовую линию.')
+        parser.add_argument('--compare', help='Сравнить с базовой линией.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p95 при сравнении, доля.'
+        )
+
+    def get_user(self, username):
+        if not username:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {username} не найден.')
+
+    def report(self, results):
+        self.stdout.write(ROW.format(
+            'url', 'status', 'p50, мс', 'p95, мс', 'p99, мс', 'запросы',
+            'запр./с'
+        ))
+        for name, result in results.items():
+            self.stdout.write(ROW.format(
+                name, result['status'], f'{result["p50"]:.1f}',
+                f'{result["p95"]:.1f}', f'{result["p99"]:.1f}',
+                f'{result["queries"]:g}', f'{result["throughput"]:.1f}'
+            ))
+
+    def report_paginator(self):
+        self.stdout.write('{:>8} {:>9} {:>7}'.format(
+            'страниц', 'p50, мс', 'ссылок'
+        ))
+        for pages, result in benchmark.paginator_render().items():
+            self.stdout.write('{:>8} {:>9.2f} {:>7}'.format(
+                pages, result['p50'], result['links']
+            ))
+
+    def handle(self, *args, **options):
+        if options['paginator']:
+            self.report_paginator()
+            return
+        user = self.get_user(options['user'])
+        try:
+            results = benchmark.run(
+                requests=options['requests'],
+                warmup=options['warmup'],
+                cold=options['cold'],
+                user=user,
+                names=options['names'],
+            )
+            baseline = None
+            if options['compare']:
+                baseline = benchmark.load_baseline(options['compare'])
+        except benchmark.BenchmarkError as error:
+            raise CommandError(error)
+        self.report(results)
+        if options['save']:
+            benchmark.save_baseline(options['save'], results)
+            self.stdout.write(f'Базовая линия {options["save"]} сохранена.')
+        if baseline is not None:
+            regressions = benchmark.compare(
+                baseline, results, options['tolerance']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «Кого почитать» по подпискам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--engine', choices=('auto', *recommendations.ENGINES),
+            help='Движок расчёта, по умолчанию RECOMMENDATIONS_ENGINE.'
+        )
+        parser.add_argument(
+            '--top-k', type=int,
+            help='Сколько авторов хранить для каждого читателя.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Скольких читателей считать за один шаг.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            readers, created = recommendations.build(
+                top_k=options['top_k'], chunk_size=options['chunk_size'],
+                engine=options['engine']
+            )
+        except ImportError as error:
+            raise CommandError(
+                f'Для движка scipy нужны NumPy и SciPy: {error}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендаций: {created} для {readers} читателей.'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии и подписки в NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Строк на чтение из базы и контрольную точку.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить прерванную выгрузку с контрольной точки.'
+        )
+
+    def handle(self, *args, **options):
+        counts = transfer.export(
+            options['path'], chunk_size=options['chunk_size'],
+            resume=options['resume'], log=self.stdout.write
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено строк: {sum(counts.values())}.'
+        ))
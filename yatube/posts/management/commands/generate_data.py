@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.dataset import PASSWORD, DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками для нагрузочного тестирования.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок одного пользователя.'
+        )
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько разных картинок создать для постов.'
+        )
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.2,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Показатель степенного закона популярности авторов.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикаций.'
+        )
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс.'
+        )
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(
+            seed=options['seed'],
+            exponent=options['exponent'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        image_names = generator.images(options['images'])
+        with transaction.atomic():
+            generator.users(options['users'])
+            generator.groups(options['groups'])
+            generator.follows(options['follows'])
+            generator.posts(
+                options['posts'], image_names, options['image_ratio']
+            )
+            generator.comments(options['comments'])
+        if not options['skip_rebuild']:
+            generator.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы, пароль пользователей: {PASSWORD}.'
+        ))
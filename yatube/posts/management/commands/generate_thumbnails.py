@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры картинок уже опубликованных постов.'
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        )
+        created = 0
+        for name in images.iterator():
+            thumbnails.generate(name)
+            created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {created}.'
+        ))
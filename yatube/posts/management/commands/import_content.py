@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии и подписки из выгрузки '
+        'export_content.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки.')
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Строк в одной транзакции bulk_create.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить прерванную загрузку с контрольной точки.'
+        )
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            counts = transfer.load(
+                options['path'], batch_size=options['batch_size'],
+                resume=options['resume'],
+                rebuild=not options['skip_rebuild'], log=self.stdout.write
+            )
+        except (OSError, transfer.TransferError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {sum(counts.values())}.'
+        ))
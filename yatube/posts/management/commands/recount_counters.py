@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            'Исправлено счётчиков: '
+            f'пользователи — {fixed["users"]}, '
+            f'группы — {fixed["groups"]}, '
+            f'посты — {fixed["posts"]}.'
+        ))
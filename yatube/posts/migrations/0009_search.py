@@ -0,0 +1,108 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:06
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from posts.stemmer import tokenize
+
+BATCH_SIZE = 500
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def create_fts_table(apps, schema_editor):
+    if fts5_available(schema_editor.connection):
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_search_fts USING fts5('
+            'post_id UNINDEXED, body)'
+        )
+
+
+def documents(apps):
+    """Посты и комментарии к ним: (post_id, comment_id, текст)."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    for post_id, text in Post.objects.values_list(
+        'id', 'text'
+    ).iterator(BATCH_SIZE):
+        yield post_id, None, text
+    for comment_id, post_id, text in Comment.objects.exclude(
+        post=None
+    ).values_list('id', 'post_id', 'text').iterator(BATCH_SIZE):
+        yield post_id, comment_id, text
+
+
+def fill_index(apps, schema_editor):
+    """Индексирует уже написанные посты и комментарии тем же способом,
+    что posts.search: иначе поиск пуст до rebuild_search_index."""
+    connection = schema_editor.connection
+    fts5 = 'posts_search_fts' in connection.introspection.table_names()
+    if settings.SEARCH_BACKEND == 'python' or not fts5:
+        SearchPosting = apps.get_model('posts', 'SearchPosting')
+        postings = []
+        for post_id, comment_id, text in documents(apps):
+            terms = Counter(tokenize(text))
+            length = sum(terms.values())
+            postings.extend(
+                SearchPosting(post_id=post_id, comment_id=comment_id,
+                              term=term[:64], frequency=frequency,
+                              length=length)
+                for term, frequency in terms.items()
+            )
+            if len(postings) >= BATCH_SIZE:
+                SearchPosting.objects.bulk_create(postings)
+                postings = []
+        SearchPosting.objects.bulk_create(postings)
+        return
+    rows = (
+        (post_id * 2 if comment_id is None else comment_id * 2 + 1,
+         post_id, ' '.join(tokenize(text)))
+        for post_id, comment_id, text in documents(apps)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_search_fts (rowid, post_id, body) '
+            'VALUES (%s, %s, %s)', rows
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=64, verbose_name='Основа слова')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Число вхождений')),
+                ('length', models.PositiveIntegerField(verbose_name='Длина документа')),
+                ('comment', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:08
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def fill_stats(apps, schema_editor):
+    SearchPosting = apps.get_model('posts', 'SearchPosting')
+    SearchStats = apps.get_model('posts', 'SearchStats')
+    documents = SearchPosting.objects.values(
+        'post_id', 'comment_id'
+    ).annotate(length=Max('length')).order_by()
+    stats = SearchStats(pk=1)
+    for document in documents.iterator():
+        stats.documents += 1
+        stats.length += document['length']
+    stats.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_followsuggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('documents', models.PositiveIntegerField(default=0, verbose_name='Документов')),
+                ('length', models.BigIntegerField(default=0, verbose_name='Суммарная длина')),
+            ],
+            options={
+                'verbose_name': 'Статистика поискового индекса',
+                'verbose_name_plural': 'Статистика поискового индекса',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
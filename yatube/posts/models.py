@@ -1,15 +1,56 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 COUNT_OF_SYMBOL = 15
 
+FEED_FIELDS = (
+    'id', 'text', 'pub_date', 'updated', 'image', 'comments_count',
+    'author', 'group',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__title', 'group__slug',
+)
+
 User = get_user_model()
 
 
+class CountedModel(models.Model):
+    """Модель, чьё сохранение меняет счётчики (posts.signals).
+
+    Сохранение идёт в транзакции вместе с сигналами, поэтому строка и
+    её счётчики записываются или откатываются вместе. Удаление Django
+    и так выполняет в транзакции вместе с сигналами.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для карточек ленты: автор и группа одним запросом."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+
+class CommentQuerySet(models.QuerySet):
+    def with_authors(self):
+        return self.select_related('author').only(
+            'id', 'text', 'created', 'post', 'author', 'author__username'
+        )
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -19,45 +60,73 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class Post(CountedModel):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
     )
     pub_date = models.DateTimeField(
         'Дата публикации',
-        auto_now_add=True,
-        db_index=True
+        auto_now_add=True
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False
     )
     group = models.ForeignKey(
         Group, blank=True, null=True,
         on_delete=models.SET_NULL,
         related_name='posts',
         verbose_name='Группа',
-        help_text='Группа, к которой будет относиться пост'
+        help_text='Группа, к которой будет относиться пост',
+        db_index=False
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы повторяют сортировку лент вместе с id, поэтому
+        # страница читается из индекса без сортировки в памяти.
+        indexes = (
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:COUNT_OF_SYMBOL]
 
 
-class Comment(models.Model):
+class Comment(CountedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -65,6 +134,7 @@ class Comment(models.Model):
         null=True,
         related_name='comments',
         verbose_name='Текст поста',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -77,32 +147,50 @@ class Comment(models.Model):
     )
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text
 
 
-class Follow(models.Model):
+class Follow(CountedModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='follower',
         verbose_name='Подписчик',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='following',
-        verbose_name='Автор постов'
+        verbose_name='Автор постов',
+        db_index=False
     )
 
     class Meta:
         verbose_name = 'Подписчик'
         verbose_name_plural = 'Подписчики'
+        # Подписки читателя покрывает уникальный индекс (user, author),
+        # подписчиков автора — обратный ему.
+        indexes = (
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=['user', 'author'],
@@ -116,3 +204,170 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class FollowSuggestion(models.Model):
+    """Автор из рекомендаций «Кого почитать» (posts.recommendations)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Читатель',
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to',
+        verbose_name='Автор постов',
+    )
+    score = models.FloatField('Оценка')
+    rank = models.PositiveSmallIntegerField('Место')
+
+    class Meta:
+        ordering = ('rank',)
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        # Рекомендации читателя по порядку читаются по этому индексу.
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'rank'],
+                name='unique_suggestion_rank',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.author_id} для {self.user_id}'
+
+
+class StagedSuggestion(models.Model):
+    """Рекомендация нового расчёта до замены ``FollowSuggestion``."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Читатель',
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор постов',
+        db_index=False,
+    )
+    score = models.FloatField('Оценка')
+    rank = models.PositiveSmallIntegerField('Место')
+
+    class Meta:
+        verbose_name = 'Рекомендация в расчёте'
+        verbose_name_plural = 'Рекомендации в расчёте'
+
+    def __str__(self):
+        return f'{self.author_id} для {self.user_id}'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов', default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='timeline_user_pub_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.post_id} в ленте {self.user_id}'
+
+
+class SearchPosting(models.Model):
+    term = models.CharField('Основа слова', max_length=64, db_index=True)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+        verbose_name='Комментарий',
+    )
+    frequency = models.PositiveIntegerField('Число вхождений')
+    length = models.PositiveIntegerField('Длина документа')
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+
+    def __str__(self):
+        return f'{self.term} в посте {self.post_id}'
+
+
+class SearchStats(models.Model):
+    """Число документов и их суммарная длина во всём индексе.
+
+    BM25 нужны оба числа на каждый поиск; индекс поддерживает их при
+    каждой записи, чтобы не пересчитывать по всем постам и
+    комментариям.
+    """
+    documents = models.PositiveIntegerField('Документов', default=0)
+    length = models.BigIntegerField('Суммарная длина', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика поискового индекса'
+        verbose_name_plural = 'Статистика поискового индекса'
+
+    def __str__(self):
+        return f'{self.documents} документов'
@@ -0,0 +1,214 @@
+"""Рекомендации «Кого почитать».
+
+``manage.py build_suggestions`` пересчитывает их целиком по подпискам.
+F — разреженная матрица «читатель × автор» (авторы — те же
+пользователи). Для читателя u считаются:
+
+* совместные подписки (F·Fᵀ)·F — авторы, на которых подписаны
+  читатели с общими с u подписками, с весом по числу общих подписок;
+* второй круг F·F — авторы, на которых подписаны авторы u.
+
+Оценка — их сумма с весами ``COFOLLOW_WEIGHT`` и
+``SECOND_DEGREE_WEIGHT``; авторы, на которых u уже подписан, и сам u
+в рекомендации не попадают. С NumPy и SciPy оценки считаются
+произведениями разреженных матриц пачками по ``chunk_size`` читателей,
+без них — тем же алгоритмом на списках в чистом Python. Лучшие
+``top_k`` авторов читателя хранятся в ``FollowSuggestion``, и страницы
+берут их одним запросом по индексу (user, rank). Новый расчёт пачками
+пишется в ``StagedSuggestion`` и подменяет старый одной короткой
+транзакцией.
+"""
+import heapq
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Follow, FollowSuggestion, StagedSuggestion
+
+COFOLLOW_WEIGHT = 1.0
+SECOND_DEGREE_WEIGHT = 2.0
+BATCH_SIZE = 2000
+ENGINES = ('scipy', 'python')
+
+
+def load_follows():
+    """Подписки двумя столбцами: читатели и авторы."""
+    users, authors = array('i'), array('i')
+    pairs = Follow.objects.order_by(
+        'user_id', 'author_id'
+    ).values_list('user_id', 'author_id')
+    for user_id, author_id in pairs.iterator(chunk_size=BATCH_SIZE):
+        users.append(user_id)
+        authors.append(author_id)
+    return users, authors
+
+
+def score(cofollow, second_degree):
+    return COFOLLOW_WEIGHT * cofollow + SECOND_DEGREE_WEIGHT * second_degree
+
+
+def rank_python(users, authors, top_k, chunk_size):
+    following = defaultdict(list)
+    followers = defaultdict(list)
+    for user_id, author_id in zip(users, authors):
+        following[user_id].append(author_id)
+        followers[author_id].append(user_id)
+    for reader in sorted(following):
+        followed = set(following[reader])
+        similar = Counter()
+        for author_id in followed:
+            for other in followers[author_id]:
+                similar[other] += 1
+        cofollow = Counter()
+        for other, common in similar.items():
+            for author_id in following[other]:
+                cofollow[author_id] += common
+        second_degree = Counter()
+        for author_id in followed:
+            second_degree.update(following.get(author_id, ()))
+        candidates = (
+            (author_id, score(cofollow[author_id], second_degree[author_id]))
+            for author_id in cofollow.keys() | second_degree.keys()
+            if author_id not in followed and author_id != reader
+        )
+        yield reader, heapq.nlargest(
+            top_k, candidates, key=lambda item: (item[1], -item[0])
+        )
+
+
+def rank_scipy(users, authors, top_k, chunk_size):
+    import numpy as np
+    from scipy import sparse
+
+    readers = np.frombuffer(users, dtype=np.intc)
+    ids, inverse = np.unique(
+        np.concatenate([readers, np.frombuffer(authors, dtype=np.intc)]),
+        return_inverse=True
+    )
+    rows, columns = inverse[:len(readers)], inverse[len(readers):]
+    size = len(ids)
+    follows = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=(size, size)
+    )
+    followed_by = follows.T.tocsr()
+    active = np.unique(rows)
+    for start in range(0, len(active), chunk_size):
+        chunk = active[start:start + chunk_size]
+        block = follows[chunk]
+        # Пара читателя с самим собой добавляет оценку только авторам,
+        # на которых он подписан, а они всё равно отбрасываются ниже.
+        similar = block @ followed_by
+        scores = (
+            COFOLLOW_WEIGHT * (similar @ follows)
+            + SECOND_DEGREE_WEIGHT * (block @ follows)
+        ).tocsr()
+        itself = sparse.csr_matrix(
+            (np.ones(len(chunk)), (np.arange(len(chunk)), chunk)),
+            shape=block.shape
+        )
+        scores = (scores - scores.multiply(block + itself)).tocsr()
+        scores.eliminate_zeros()
+        for row, reader in enumerate(chunk):
+            begin, end = scores.indptr[row], scores.indptr[row + 1]
+            columns = scores.indices[begin:end]
+            values = scores.data[begin:end]
+            # Номера столбцов упорядочены как id, поэтому при равной
+            # оценке выше автор с меньшим id — как в rank_python.
+            best = np.lexsort((columns, -values))[:top_k]
+            yield int(ids[reader]), [
+                (int(ids[column]), float(value))
+                for column, value in zip(columns[best], values[best])
+            ]
+
+
+def vectorized_available():
+    try:
+        import numpy  # noqa: F401
+        import scipy.sparse  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_engine(choice=None):
+    choice = choice or settings.RECOMMENDATIONS_ENGINE
+    if choice == 'auto':
+        choice = 'scipy' if vectorized_available() else 'python'
+    if choice not in ENGINES:
+        raise ValueError(f'Неизвестный движок рекомендаций: {choice}')
+    return rank_scipy if choice == 'scipy' else rank_python
+
+
+def _swap_staged():
+    """Заменяет рекомендации строками ``StagedSuggestion``."""
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(column) for column in ('user_id', 'author_id', 'score', 'rank')
+    )
+    with transaction.atomic():
+        FollowSuggestion.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(FollowSuggestion._meta.db_table)} '
+                f'({columns}) SELECT {columns} '
+                f'FROM {quote(StagedSuggestion._meta.db_table)}'
+            )
+    StagedSuggestion.objects.all().delete()
+
+
+def build(top_k=None, chunk_size=None, engine=None):
+    """Пересчитывает рекомендации; возвращает число читателей и
+    рекомендаций.
+
+    Оценки пишутся в ``StagedSuggestion`` пачками по мере расчёта, и в
+    памяти держится одна пачка. Транзакция охватывает только замену
+    строк: на SQLite она держит блокировку записи всей базы, и долгий
+    расчёт внутри неё остановил бы посты, комментарии и подписки на
+    сайте. До её конца видны старые рекомендации.
+    """
+    rank = get_engine(engine)
+    StagedSuggestion.objects.all().delete()
+    readers = suggestions = 0
+    batch = []
+    for reader, authors in rank(
+        *load_follows(),
+        top_k or settings.RECOMMENDATIONS_TOP_K,
+        chunk_size or settings.RECOMMENDATIONS_CHUNK_SIZE,
+    ):
+        readers += 1
+        batch.extend(
+            StagedSuggestion(
+                user_id=reader, author_id=author_id, score=value, rank=place
+            )
+            for place, (author_id, value) in enumerate(authors)
+        )
+        if len(batch) >= BATCH_SIZE:
+            StagedSuggestion.objects.bulk_create(batch)
+            suggestions += len(batch)
+            batch = []
+    StagedSuggestion.objects.bulk_create(batch)
+    suggestions += len(batch)
+    _swap_staged()
+    return readers, suggestions
+
+
+def suggestions_for(user, exclude=None):
+    """Авторы для блока «Кого почитать» без тех, на кого читатель
+    подписался после пересчёта, — один запрос."""
+    if not user.is_authenticated:
+        return []
+    queryset = FollowSuggestion.objects.filter(user=user).exclude(
+        author__in=Follow.objects.filter(user=user).values('author')
+    )
+    if exclude is not None:
+        queryset = queryset.exclude(author_id=exclude)
+    return [
+        suggestion.author for suggestion in queryset.select_related(
+            'author'
+        ).only(
+            'author', 'author__username', 'author__first_name',
+            'author__last_name'
+        )[:settings.RECOMMENDATIONS_SHOWN]
+    ]
@@ -0,0 +1,271 @@
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.db.models import F
+from django.dispatch import receiver
+
+from .models import Comment, Post, SearchPosting, SearchStats
+from .stemmer import tokenize
+
+FTS_TABLE = 'posts_search_fts'
+BM25_K1 = 1.2
+BM25_B = 0.75
+BATCH_SIZE = 500
+STATS_PK = 1
+
+_backend = None
+
+
+def _post_rowid(post_id):
+    return post_id * 2
+
+
+def _comment_rowid(comment_id):
+    return comment_id * 2 + 1
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def _top(scores, limit):
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [key for key, _ in ranked[:limit]]
+
+
+class Fts5Backend:
+    """Индекс в виртуальной таблице SQLite FTS5.
+
+    В таблицу пишутся уже выделенные основы слов, поэтому русская
+    морфология работает без собственного токенизатора SQLite. Посты
+    и комментарии делят rowid: чётные — посты, нечётные — комментарии.
+    """
+    name = 'fts5'
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid]
+            )
+
+    def _replace(self, rowid, post_id, text):
+        self._delete(rowid)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, post_id, body) '
+                'VALUES (%s, %s, %s)',
+                [rowid, post_id, ' '.join(tokenize(text))]
+            )
+
+    def index_post(self, post):
+        self._replace(_post_rowid(post.pk), post.pk, post.text)
+
+    def index_comment(self, comment):
+        self._replace(
+            _comment_rowid(comment.pk), comment.post_id, comment.text
+        )
+
+    def remove_post(self, post_id):
+        self._delete(_post_rowid(post_id))
+
+    def remove_comment(self, comment_id):
+        self._delete(_comment_rowid(comment_id))
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, query, limit):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"' for term in terms)
+        with connection.cursor() as cursor:
+            # LIMIT во вложенном запросе не даёт SQLite развернуть его
+            # во внешний: bm25() работает только рядом с MATCH.
+            cursor.execute(
+                'SELECT post_id FROM ('
+                f'SELECT post_id, bm25({FTS_TABLE}) AS rank '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT -1'
+                ') GROUP BY post_id ORDER BY SUM(rank), post_id LIMIT %s',
+                [match, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search_comments(self, query, limit):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid %% 2 = 1 '
+                f'ORDER BY bm25({FTS_TABLE}), rowid LIMIT %s',
+                [match, limit]
+            )
+            return [(row[0] - 1) // 2 for row in cursor.fetchall()]
+
+
+class PythonBackend:
+    """Инвертированный индекс в таблице SearchPosting.
+
+    Используется, когда FTS5 недоступен. Ранжирование по BM25 считается
+    в Python по спискам вхождений искомых основ; число документов и их
+    суммарную длину индекс держит в SearchStats.
+    """
+    name = 'python'
+
+    def _update_stats(self, documents, length):
+        if not documents and not length:
+            return
+        changes = {
+            'documents': F('documents') + documents,
+            'length': F('length') + length,
+        }
+        stats = SearchStats.objects.filter(pk=STATS_PK)
+        if not stats.update(**changes):
+            SearchStats.objects.get_or_create(pk=STATS_PK)
+            stats.update(**changes)
+
+    def _delete(self, postings):
+        documents = set(
+            postings.values_list('post_id', 'comment_id', 'length')
+        )
+        postings.delete()
+        self._update_stats(
+            -len(documents), -sum(length for _, _, length in documents)
+        )
+
+    def _replace(self, post_id, comment_id, text):
+        self._delete(SearchPosting.objects.filter(
+            post_id=post_id, comment_id=comment_id
+        ))
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        SearchPosting.objects.bulk_create(
+            (SearchPosting(post_id=post_id, comment_id=comment_id,
+                           term=term[:64], frequency=frequency,
+                           length=length)
+             for term, frequency in terms.items()),
+            batch_size=BATCH_SIZE,
+        )
+        if terms:
+            self._update_stats(1, length)
+
+    def index_post(self, post):
+        self._replace(post.pk, None, post.text)
+
+    def index_comment(self, comment):
+        self._replace(comment.post_id, comment.pk, comment.text)
+
+    def remove_post(self, post_id):
+        self._delete(SearchPosting.objects.filter(post_id=post_id))
+
+    def remove_comment(self, comment_id):
+        self._delete(SearchPosting.objects.filter(comment_id=comment_id))
+
+    def clear(self):
+        SearchPosting.objects.all().delete()
+        SearchStats.objects.all().delete()
+
+    def _scores(self, query):
+        """Оценки документов, где есть все основы запроса."""
+        terms = query_terms(query)
+        if not terms:
+            return {}
+        postings = SearchPosting.objects.filter(
+            term__in=[term[:64] for term in terms]
+        ).values_list('term', 'post_id', 'comment_id', 'frequency', 'length')
+        docs = defaultdict(dict)
+        lengths = {}
+        for term, post_id, comment_id, frequency, length in postings:
+            docs[(post_id, comment_id)][term] = frequency
+            lengths[(post_id, comment_id)] = length
+        matched = {
+            doc: frequencies for doc, frequencies in docs.items()
+            if len(frequencies) == len(terms)
+        }
+        if not matched:
+            return {}
+        total_docs, total_length = SearchStats.objects.filter(
+            pk=STATS_PK
+        ).values_list('documents', 'length').first() or (0, 0)
+        total_docs = max(total_docs, len(docs))
+        document_frequency = Counter(
+            term for frequencies in docs.values() for term in frequencies
+        )
+        average_length = total_length / total_docs or 1
+        scores = {}
+        for doc, frequencies in matched.items():
+            norm = BM25_K1 * (
+                1 - BM25_B + BM25_B * lengths[doc] / average_length
+            )
+            scores[doc] = sum(
+                math.log(1 + (
+                    total_docs - document_frequency[term] + 0.5
+                ) / (document_frequency[term] + 0.5))
+                * frequency * (BM25_K1 + 1) / (frequency + norm)
+                for term, frequency in frequencies.items()
+            )
+        return scores
+
+    def search(self, query, limit):
+        scores = defaultdict(float)
+        for (post_id, _), score in self._scores(query).items():
+            scores[post_id] += score
+        return _top(scores, limit)
+
+    def search_comments(self, query, limit):
+        return _top({
+            comment_id: score
+            for (_, comment_id), score in self._scores(query).items()
+            if comment_id is not None
+        }, limit)
+
+
+def fts5_ready():
+    return (
+        connection.vendor == 'sqlite'
+        and FTS_TABLE in connection.introspection.table_names()
+    )
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting == 'SEARCH_BACKEND':
+        _backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        choice = settings.SEARCH_BACKEND
+        if choice == 'auto':
+            choice = 'fts5' if fts5_ready() else 'python'
+        _backend = Fts5Backend() if choice == 'fts5' else PythonBackend()
+    return _backend
+
+
+def search_posts(query):
+    """Номера постов по убыванию релевантности запросу."""
+    return get_backend().search(query, settings.SEARCH_MAX_RESULTS)
+
+
+def search_comments(query):
+    """Номера комментариев по убыванию релевантности запросу."""
+    return get_backend().search_comments(query, settings.SEARCH_MAX_RESULTS)
+
+
+def rebuild():
+    backend = get_backend()
+    backend.clear()
+    for post in Post.objects.only('id', 'text').iterator(BATCH_SIZE):
+        backend.index_post(post)
+    comments = Comment.objects.exclude(post=None).only('id', 'post', 'text')
+    for comment in comments.iterator(BATCH_SIZE):
+        backend.index_comment(comment)
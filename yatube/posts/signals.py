@@ -0,0 +1,207 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from taskqueue.registry import enqueue
+
+from . import counters, events, follow_graph, search, tasks, timeline
+from .cache import (FEED_VERSION_KEY, bump_version, comments_version_key,
+                    group_version_key, post_version_key, user_version_key)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue(
+            tasks.fan_out_post, instance.pk,
+            key=f'timeline:fan_out:{instance.pk}'
+        )
+
+
+@receiver(post_save, sender=Post)
+def notify_open_feeds(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: events.publish_post(instance))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def record_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: follow_graph.record(
+            follow_graph.FOLLOW, instance.user_id, instance.author_id
+        ))
+
+
+@receiver(post_delete, sender=Follow)
+def record_unfollow(sender, instance, **kwargs):
+    transaction.on_commit(lambda: follow_graph.record(
+        follow_graph.UNFOLLOW, instance.user_id, instance.author_id
+    ))
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=Comment)
+@receiver(post_delete, sender=User)
+def invalidate_feed_pages(sender, **kwargs):
+    bump_version(FEED_VERSION_KEY)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+def _origin(instance):
+    # Только загруженные поля: отложенное (only/defer) при обращении к
+    # атрибуту загружалось бы отдельным запросом на каждый объект.
+    return {
+        field: instance.__dict__[field]
+        for field in ('author_id', 'group_id') if field in instance.__dict__
+    }
+
+
+@receiver(post_init, sender=Post)
+def remember_post_origin(sender, instance, **kwargs):
+    """Автор и группа поста из базы: при сохранении по ним видно,
+    какие счётчики переносить, без повторного чтения поста."""
+    if instance.pk is not None:
+        instance._counters_origin = _origin(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    origin = getattr(instance, '_counters_origin', {})
+    instance._counters_origin = _origin(instance)
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+        return
+    # Поле, отложенное при загрузке, не сравнить: такой перенос
+    # исправит recount_counters.
+    moved = {
+        field: value for field, value in origin.items()
+        if instance._counters_origin.get(field, value) != value
+    }
+    if 'author_id' in moved:
+        counters.change_user(moved['author_id'], 'posts_count', -1)
+        counters.change_user(instance.author_id, 'posts_count', 1)
+    if 'group_id' in moved:
+        counters.change_group(moved['group_id'], -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_delete, sender=Follow)
+def refill_former_popular(sender, instance, **kwargs):
+    # Порог можно пересечь много раз, поэтому задача без ключа.
+    if timeline.left_popular(instance.author_id):
+        enqueue(tasks.refill_timelines, instance.author_id)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_card(sender, instance, **kwargs):
+    bump_version(post_version_key(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_group_cards(sender, instance, **kwargs):
+    bump_version(group_version_key(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_first_comments(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        bump_version(comments_version_key(instance.post_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created=False,
+                            update_fields=None, **kwargs):
+    if update_fields is None or not set(update_fields) <= {'last_login'}:
+        bump_version(user_version_key(instance.pk))
+        # Имя автора есть в закэшированных лентах и ответах API.
+        if not created:
+            bump_version(FEED_VERSION_KEY)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        transaction.on_commit(lambda: tasks.schedule_thumbnails(instance))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Каждая правка поста переиндексируется один раз.
+        enqueue(
+            tasks.index_post, instance.pk,
+            key=f'search:post:{instance.pk}:{instance.updated.timestamp()}'
+        )
+
+
+# До удаления: каскад стирает записи индекса раньше post_delete, а
+# статистике индекса нужны их длины.
+@receiver(pre_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, raw=False, **kwargs):
+    if instance.post_id is not None and not raw:
+        enqueue(
+            tasks.index_comment, instance.pk,
+            key=f'search:comment:{instance.pk}' if created else None
+        )
+
+
+@receiver(pre_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.get_backend().remove_comment(instance.pk)
@@ -0,0 +1,108 @@
+"""Стеммер для русского языка по алгоритму Snowball (Портера)."""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('вшись', 'вши', 'в'),
+    ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое',
+    'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую',
+    'юю', 'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но',
+     'ет', 'ют', 'ны', 'ть', 'й', 'л', 'н'),
+    ('ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило',
+     'ыло', 'ено', 'ует', 'уют', 'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю'),
+)
+NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие',
+    'ье', 'еи', 'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах',
+    'ях', 'ию', 'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы',
+    'ь', 'ю', 'я',
+)
+DERIVATIONAL = ('ость', 'ост')
+SUPERLATIVE = ('ейше', 'ейш')
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def _region(word, start=0):
+    for index in range(start + 1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _strip(word, start, endings, preceded=False):
+    """Отрезает самое длинное окончание, лежащее в области ``start``.
+
+    Окончания первой группы при ``preceded`` должны идти после «а» или
+    «я», которые остаются в слове.
+    """
+    for ending in sorted(endings, key=len, reverse=True):
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if len(stem) < start:
+            continue
+        if preceded and (len(stem) <= start or stem[-1] not in 'ая'):
+            continue
+        return stem
+    return None
+
+
+def _strip_groups(word, start, groups):
+    first, second = groups
+    candidates = [
+        stem for stem in (
+            _strip(word, start, first, preceded=True),
+            _strip(word, start, second),
+        ) if stem is not None
+    ]
+    return min(candidates, key=len) if candidates else None
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word)
+    )
+    r2 = _region(word, _region(word))
+    result = _strip_groups(word, rv, PERFECTIVE_GERUND)
+    if result is None:
+        word = _strip(word, rv, REFLEXIVE) or word
+        adjective = _strip(word, rv, ADJECTIVE)
+        if adjective is not None:
+            result = _strip_groups(adjective, rv, PARTICIPLE) or adjective
+        else:
+            result = _strip_groups(word, rv, VERB)
+            if result is None:
+                result = _strip(word, rv, NOUN)
+    word = word if result is None else result
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+    word = _strip(word, r2, DERIVATIONAL) or word
+    superlative = _strip(word, rv, SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+    if word.endswith('нн') and len(word) > rv:
+        word = word[:-1]
+    elif word.endswith('ь') and len(word) > rv:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Основы слов текста в порядке появления."""
+    return [stem(token) for token in TOKEN_RE.findall(text.lower())]
@@ -0,0 +1,54 @@
+"""Фоновые задачи приложения posts.
+
+Задачи получают идентификаторы и перечитывают объекты из базы: к
+запуску пост могли изменить или удалить.
+"""
+from taskqueue.registry import enqueue, task
+
+from . import search, thumbnails, timeline
+from .models import Comment, Post
+
+
+@task()
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'id', 'author_id', 'pub_date'
+    ).first()
+    if post is not None:
+        timeline.fan_out_post(post)
+
+
+@task()
+def refill_timelines(author_id):
+    timeline.refill(author_id)
+
+
+@task()
+def index_post(post_id):
+    post = Post.objects.filter(pk=post_id).only('id', 'text').first()
+    if post is not None:
+        search.get_backend().index_post(post)
+
+
+@task()
+def index_comment(comment_id):
+    comment = Comment.objects.filter(pk=comment_id).only(
+        'id', 'post_id', 'text'
+    ).first()
+    if comment is not None:
+        search.get_backend().index_comment(comment)
+
+
+@task()
+def generate_thumbnails(post_id, image_name):
+    thumbnails.generate(image_name)
+    thumbnails.invalidate(post_id)
+
+
+def schedule_thumbnails(post):
+    """Ставит создание миниатюр картинки поста в очередь."""
+    if post.image:
+        enqueue(
+            generate_thumbnails, post.pk, post.image.name,
+            key=f'thumbnails:{post.image.name}'
+        )
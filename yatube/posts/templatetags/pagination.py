@@ -0,0 +1,11 @@
+from django import template
+
+from .. import utils
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj):
+    """Номера страниц для ссылок пагинатора, ``None`` — пропуск."""
+    return utils.page_window(page_obj.number, page_obj.paginator.num_pages)
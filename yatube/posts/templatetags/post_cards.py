@@ -0,0 +1,35 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ..cache import card_cache_keys
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, detail_link=False):
+    """Карточки постов из кэша; недостающие рендерит и сохраняет.
+
+    Использование: ``{% post_cards page_obj as cards %}``;
+    ``detail_link=True`` добавляет в карточку ссылку на пост.
+    """
+    posts = list(posts)
+    keys = {
+        post_id: f'{key}:link' if detail_link else key
+        for post_id, key in card_cache_keys(posts).items()
+    }
+    fragments = cache.get_many(keys.values())
+    rendered = {}
+    for post in posts:
+        key = keys[post.pk]
+        if key not in fragments:
+            rendered[key] = fragments[key] = render_to_string(
+                'posts/includes/post_card.html',
+                {'post': post, 'detail_link': detail_link}
+            )
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(fragments[keys[post.pk]]) for post in posts]
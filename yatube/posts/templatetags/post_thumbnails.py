@@ -0,0 +1,13 @@
+from django import template
+
+from ..thumbnails import lookup_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, alias):
+    """Адрес заранее созданной миниатюры, пока её нет — оригинала."""
+    if not image:
+        return ''
+    return lookup_url(image, alias) or image.url
@@ -0,0 +1,80 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import Min
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import benchmark
+from ..models import Comment, Follow, Group, Post, User, UserStats
+from ..utils import page_window
+
+
+class GenerateDataTests(TestCase):
+    def test_generates_consistent_dataset(self):
+        """Данные создаются пачками, счётчики и ленты пересчитаны."""
+        call_command(
+            'generate_data', users=30, groups=3, posts=200, comments=100,
+            follows=5, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            200
+        )
+        self.assertLess(
+            Post.objects.aggregate(first=Min('pub_date'))['first'],
+            timezone.now() - timedelta(days=1)
+        )
+        top = UserStats.objects.order_by('-followers_count').first()
+        self.assertGreater(top.followers_count, Follow.objects.count() / 30)
+
+
+class PageWindowTests(TestCase):
+    def test_window_around_current_page(self):
+        self.assertEqual(page_window(1, 3), [1, 2, 3])
+        self.assertEqual(
+            page_window(50, 100), [1, None, 48, 49, 50, 51, 52, None, 100]
+        )
+        self.assertEqual(page_window(2, 100), [1, 2, 3, 4, None, 100])
+        self.assertEqual(page_window(5, 100), [1, 2, 3, 4, 5, 6, 7, None, 100])
+
+    def test_paginator_markup_does_not_grow(self):
+        """Число ссылок пагинатора не зависит от числа страниц."""
+        results = benchmark.paginator_render((10, 100000), repeats=1)
+        self.assertEqual(results[10]['links'], results[100000]['links'])
+
+
+class BenchmarkCommandTests(TestCase):
+    def setUp(self):
+        call_command(
+            'generate_data', users=5, groups=1, posts=20, comments=10,
+            follows=2, seed=1, stdout=StringIO()
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(BENCHMARK_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_reports_and_compares_baseline(self):
+        """Все страницы замеряются, базовая линия сохраняется и
+        сравнивается, рост числа запросов считается регрессией."""
+        out = StringIO()
+        call_command('benchmark', requests=2, warmup=0, save='base',
+                     stdout=out)
+        for name in ('index', 'group_posts', 'post_detail', 'profile',
+                     'follow_index'):
+            self.assertIn(name, out.getvalue())
+        self.assertNotIn('profile_follow', out.getvalue())
+        call_command('benchmark', requests=2, warmup=0, compare='base',
+                     tolerance=100, url=['index'], stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('benchmark', requests=2, warmup=0, cold=True,
+                         compare='base', tolerance=100, url=['index'],
+                         stdout=StringIO())
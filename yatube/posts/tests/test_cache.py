@@ -0,0 +1,122 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from ..cache import (FEED_VERSION_KEY, cache_feed_page, get_version,
+                     page_cache_key)
+from ..models import Comment, Group, Post, User
+
+
+class FeedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+        self.calls = 0
+
+    def view(self, request):
+        self.calls += 1
+        return HttpResponse('свежая страница')
+
+    def test_version_changes_on_content_changes(self):
+        """Версия ленты меняется при изменении постов, групп
+        и комментариев."""
+        user = mixer.blend(User)
+        for factory in (
+            lambda: mixer.blend(Group),
+            lambda: mixer.blend(Post, author=user),
+            lambda: mixer.blend(Comment, author=user),
+        ):
+            version = get_version(FEED_VERSION_KEY)
+            factory()
+            self.assertNotEqual(get_version(FEED_VERSION_KEY), version)
+
+    def test_page_is_rendered_once(self):
+        """Пока версия не изменилась, представление вызывается один раз."""
+        view = cache_feed_page('test_page')(self.view)
+        view(self.request)
+        response = view(self.request)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(response.content, 'свежая страница'.encode())
+
+    @override_settings(FEED_PAGE_CACHE_TIMEOUT=60)
+    def test_page_expires(self):
+        """Страница хранится с конечным сроком, чтобы ключи старых
+        версий освобождались."""
+        view = cache_feed_page('test_page')(self.view)
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            view(self.request)
+        self.assertEqual(cache_set.call_args[0][2], 60)
+
+    @override_settings(CACHE_REBUILD_LOCK_TIMEOUT=5)
+    def test_waits_for_rebuild_in_progress(self):
+        """Запрос ждёт страницу, которую пересобирает другой воркер."""
+        key = page_cache_key(self.request, 'test_page')
+        cache.add(f'{key}:lock', 1)
+        rebuilt = HttpResponse('страница другого воркера')
+        timer = threading.Timer(0.1, cache.set, (key, rebuilt, None))
+        timer.start()
+        response = cache_feed_page('test_page')(self.view)(self.request)
+        timer.join()
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(response.content, rebuilt.content)
+
+
+class PostCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = mixer.blend(
+            User, first_name='Лев', last_name='Толстой')
+        self.group = mixer.blend(Group, title='Классика')
+        self.post = mixer.blend(
+            Post, author=self.author, group=self.group, image='')
+        self.url = reverse(
+            'posts:profile', kwargs={'username': self.author.username})
+
+    def test_cards_are_rendered_once(self):
+        """Повторный показ ленты берёт карточки из кэша."""
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, 'posts/includes/post_card.html')
+        response = self.client.get(self.url)
+        self.assertTemplateNotUsed(
+            response, 'posts/includes/post_card.html')
+        self.assertContains(response, self.post.text)
+
+    def test_cards_are_invalidated(self):
+        """Карточка обновляется при изменении поста, имени автора
+        и группы."""
+        self.client.get(self.url)
+        changes = (
+            (self.post, 'text', 'Новый текст поста'),
+            (self.author, 'first_name', 'Алексей'),
+            (self.group, 'title', 'Новая классика'),
+        )
+        for obj, field, value in changes:
+            with self.subTest(field=field):
+                setattr(obj, field, value)
+                obj.save()
+                self.assertContains(self.client.get(self.url), value)
+
+    def test_detail_link_only_where_it_was(self):
+        """Ссылка на пост есть в профиле, но не на главной; карточки
+        с ней и без неё кэшируются отдельно."""
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertContains(self.client.get(self.url), detail_url)
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')), detail_url)
+
+    @override_settings(POST_CARD_CACHE_TIMEOUT=60)
+    def test_cards_expire(self):
+        """Карточки хранятся с конечным сроком."""
+        with mock.patch.object(
+            cache, 'set_many', wraps=cache.set_many
+        ) as set_many:
+            self.client.get(self.url)
+        self.assertIn(mock.call(mock.ANY, 60), set_many.call_args_list)
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from .. import comments
+from ..models import Comment, Post, User
+from ..utils import encode_cursor
+
+
+@override_settings(COMMENTS_NUMBER=3)
+class CommentPagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.post = mixer.blend(Post, image='')
+        self.comments = [
+            Comment.objects.create(
+                post=self.post, author=self.user, text=f'Комментарий {number}'
+            )
+            for number in range(5)
+        ]
+        self.url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def test_pages_follow_cursor(self):
+        """Комментарии идут страницами, фрагмент отдаёт следующую."""
+        page = comments.get_page(self.post.pk)
+        self.assertEqual(list(page), self.comments[:1:-1])
+        fragment = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': page.next_cursor, 'format': 'json'}
+        ).json()
+        self.assertIn('Комментарий 0', fragment['html'])
+        self.assertNotIn(self.comments[-1].text, fragment['html'])
+
+    def test_detail_shows_first_page_and_more_link(self):
+        response = self.client.get(self.url)
+        content = response.content.decode()
+        self.assertIn('Комментарий 4', content)
+        self.assertIn('data-more-comments', content)
+        self.assertNotIn('Комментарий 0', content)
+
+    @override_settings(COMMENTS_CACHE_TIMEOUT=60)
+    def test_first_page_expires(self):
+        """Фрагмент хранится с конечным сроком."""
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            comments.first_page(self.post.pk)
+        self.assertEqual(cache_set.call_args[0][2], 60)
+
+    def test_first_page_is_cached_until_new_comment(self):
+        """Первая страница берётся из кэша, пока не добавят
+        комментарий или автор не сменит имя."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            comments.first_page(self.post.pk)
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Свежий комментарий'}
+        )
+        self.assertIn('Свежий комментарий', comments.first_page(self.post.pk))
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertIn('renamed', comments.first_page(self.post.pk))
+
+    def test_broken_cursor(self):
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        for cursor in (
+            'мусор', encode_cursor(['2020-01-01T00:00:00', 'abc'])
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,97 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from mixer.backend.django import mixer
+
+from .. import counters
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = mixer.blend(User)
+        cls.author = mixer.blend(User)
+        cls.group = mixer.blend(Group)
+        cls.other_group = mixer.blend(Group)
+
+    def assertCounters(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_posts_and_comments_are_counted(self):
+        """Счётчики постов автора, группы и комментариев поста
+        меняются при создании, переносе и удалении."""
+        post = mixer.blend(Post, author=self.author, group=self.group)
+        mixer.cycle(2).blend(Comment, post=post, author=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertCounters(self.author, posts_count=1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        self.assertCounters(self.author, posts_count=0)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_post_update_does_not_reread_post(self):
+        """Перенос поста в другую группу не перечитывает пост."""
+        post = mixer.blend(Post, author=self.author, group=self.group)
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other_group
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertFalse([
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "posts_post"' in query['sql']
+        ])
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 1)
+
+    def test_counters_roll_back_with_row(self):
+        """Ошибка обновления счётчика откатывает и сам пост."""
+        with mock.patch.object(
+            counters, 'change_group', side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                Post.objects.create(
+                    text='Откатится', author=self.author, group=self.group
+                )
+        self.assertFalse(Post.objects.filter(text='Откатится').exists())
+        self.assertCounters(self.author, posts_count=0)
+
+    def test_follows_are_counted(self):
+        """Счётчики подписчиков и подписок меняются при подписке
+        и отписке."""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertCounters(self.author, followers_count=1)
+        self.assertCounters(self.user, following_count=1)
+        follow.delete()
+        self.assertCounters(self.author, followers_count=0)
+        self.assertCounters(self.user, following_count=0)
+
+    def test_recount_counters_fixes_drift(self):
+        """Команда recount_counters исправляет расхождения."""
+        Post.objects.bulk_create(
+            Post(text='Без сигналов', author=self.author, group=self.group)
+            for _ in range(3)
+        )
+        UserStats.objects.filter(user=self.user).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertCounters(self.author, posts_count=3)
+        self.assertCounters(self.user, posts_count=0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+from core.asgi import Router, WsgiBridge, run_sync
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+from yatube.asgi import django_application
+
+from ..events import broker, routes
+from ..models import Follow, Group, Post, User
+
+EVENTS_URL = '/events/'
+application = Router(routes(EVENTS_URL), WsgiBridge(django_application))
+
+
+def make_scope(path, cookie=None):
+    headers = [(b'cookie', cookie.encode())] if cookie else []
+    return {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+        'headers': headers, 'http_version': '1.1', 'scheme': 'http',
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+    }
+
+
+class Connection:
+    """Запрос к ASGI-приложению, который можно читать по сообщениям."""
+
+    def __init__(self, path, cookie=None):
+        self.inbox = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        self.inbox.put_nowait({'type': 'http.request', 'body': b''})
+        self.task = asyncio.ensure_future(application(
+            make_scope(path, cookie), self.inbox.get, self.sent.put
+        ))
+
+    async def receive(self):
+        return await asyncio.wait_for(self.sent.get(), 5)
+
+    async def body(self):
+        return (await self.receive())['body'].decode()
+
+    async def last_count(self):
+        """Число из последнего события, когда новые перестали идти."""
+        count = None
+        while True:
+            try:
+                message = await asyncio.wait_for(self.sent.get(), 0.2)
+            except asyncio.TimeoutError:
+                return count
+            count = json.loads(message['body'].decode().split('data: ')[1])[
+                'count'
+            ]
+
+    async def start(self):
+        start = await self.receive()
+        if start['status'] == 200:
+            self.assert_retry(await self.body())
+        return start['status']
+
+    @staticmethod
+    def assert_retry(body):
+        assert body.startswith('retry:'), body
+
+    async def close(self):
+        await self.inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, 5)
+
+
+class FeedEventsTests(TransactionTestCase):
+    def setUp(self):
+        self.author = mixer.blend(User)
+        self.group = mixer.blend(Group)
+        self.other_group = mixer.blend(Group)
+
+    def publish(self, *groups, author=None):
+        return run_sync(lambda: [
+            Post.objects.create(
+                author=author or self.author, text='Новость', group=group
+            ) for group in groups or [None]
+        ])
+
+    def test_feeds_count_new_posts(self):
+        """Общая лента и лента группы узнают о своих новых постах,
+        соединение освобождает подписку после отключения."""
+        async def scenario():
+            feed = Connection('/events/feed/')
+            group = Connection(f'/events/group/{self.group.slug}/')
+            self.assertEqual(await feed.start(), 200)
+            self.assertEqual(await group.start(), 200)
+            await self.publish(self.other_group, self.group, self.group)
+            self.assertEqual(await feed.last_count(), 3)
+            self.assertEqual(await group.last_count(), 2)
+            await feed.close()
+            await group.close()
+
+        asyncio.run(scenario())
+        self.assertEqual(broker.subscribers(), 0)
+
+    def test_follow_feed_needs_login_and_follows(self):
+        reader = mixer.blend(User)
+        Follow.objects.create(user=reader, author=self.author)
+        self.client.force_login(reader)
+        cookie = f'sessionid={self.client.cookies["sessionid"].value}'
+
+        async def scenario():
+            self.assertEqual(
+                await Connection('/events/follow/').start(), 401
+            )
+            follow = Connection('/events/follow/', cookie)
+            self.assertEqual(await follow.start(), 200)
+            await self.publish(author=mixer.blend(User))
+            await self.publish()
+            self.assertEqual(await follow.last_count(), 1)
+            await follow.close()
+            self.assertEqual(
+                await Connection('/events/group/missing/').start(), 404
+            )
+
+        asyncio.run(scenario())
+
+    @override_settings(EVENTS_URL=EVENTS_URL)
+    def test_other_pages_served_by_django(self):
+        async def scenario():
+            page = Connection('/')
+            start = await page.receive()
+            return start['status'], await page.body()
+
+        status, body = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertIn("new EventSource('/events/feed/')", body)
+
+    def test_no_events_without_asgi(self):
+        """Без адреса потоков событий страницы не подключают баннер."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[self.group.slug]),
+        ):
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), 'EventSource')
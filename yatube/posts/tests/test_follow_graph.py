@@ -0,0 +1,137 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from .. import follow_graph, transfer
+from ..cache import get_version
+from ..follow_graph import FollowGraph, change_key
+from ..models import Follow, User
+
+
+class FollowGraphTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        follow_graph.graph.reset()
+        self.reader, self.author, self.other = mixer.cycle(3).blend(User)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.reader)
+        Follow.objects.create(user=self.other, author=self.author)
+
+    def test_queries_after_lazy_load_skip_database(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(
+                follow_graph.is_following(self.reader.pk, self.author.pk)
+            )
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                follow_graph.is_following(self.reader.pk, self.other.pk)
+            )
+            self.assertEqual(
+                follow_graph.following_any(
+                    self.other.pk, [self.reader.pk, self.author.pk]
+                ),
+                {self.author.pk}
+            )
+            self.assertEqual(
+                follow_graph.mutuals(self.reader.pk), [self.author.pk]
+            )
+            self.assertEqual(follow_graph.followers_count(self.author.pk), 2)
+            self.assertEqual(follow_graph.following_count(self.other.pk), 1)
+            self.assertEqual(
+                follow_graph.followers(self.author.pk),
+                sorted([self.reader.pk, self.other.pk])
+            )
+
+    def test_follow_views_update_graph_incrementally(self):
+        follow_graph.is_following(self.reader.pk, self.other.pk)
+        self.client.force_login(self.reader)
+        username = self.other.username
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': username}
+        ))
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.reader.pk, self.other.pk)
+            )
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': username}
+        ))
+        self.assertTrue(response.context['following'])
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': username}
+        ))
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                follow_graph.is_following(self.reader.pk, self.other.pk)
+            )
+
+    def test_other_process_replays_journal_or_reloads(self):
+        process = FollowGraph()
+        process.is_following(self.reader.pk, self.other.pk)
+        Follow.objects.create(user=self.reader, author=self.other)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                process.is_following(self.reader.pk, self.other.pk)
+            )
+        Follow.objects.filter(user=self.reader, author=self.other).delete()
+        cache.delete(change_key(get_version(follow_graph.VERSION_KEY)))
+        with self.assertNumQueries(1):
+            self.assertFalse(
+                process.is_following(self.reader.pk, self.other.pk)
+            )
+
+    def test_atomic_block_queries_follow_by_index(self):
+        """В транзакции граф не загружается: один запрос с условием."""
+        with transaction.atomic():
+            with self.assertNumQueries(1) as context:
+                self.assertTrue(
+                    follow_graph.is_following(self.reader.pk, self.author.pk)
+                )
+            self.assertEqual(
+                follow_graph.mutuals(self.reader.pk), [self.author.pk]
+            )
+            self.assertEqual(follow_graph.followers_count(self.author.pk), 2)
+        self.assertIsNone(follow_graph.graph.adjacency)
+        self.assertIn('WHERE', context.captured_queries[0]['sql'])
+
+    def test_graph_on_local_cache_reloads_periodically(self):
+        """Кэш профиля local не общий: граф перечитывается по сроку."""
+        follow_graph.is_following(self.reader.pk, self.other.pk)
+        with mock.patch.object(
+            follow_graph, 'is_process_local', return_value=True
+        ), mock.patch.object(follow_graph, 'LOCAL_RELOAD_INTERVAL', -1):
+            with self.assertNumQueries(1):
+                follow_graph.is_following(self.reader.pk, self.other.pk)
+
+    def test_rolled_back_follow_is_not_kept(self):
+        follow_graph.is_following(self.other.pk, self.reader.pk)
+        with transaction.atomic():
+            Follow.objects.create(user=self.other, author=self.reader)
+            self.assertTrue(
+                follow_graph.is_following(self.other.pk, self.reader.pk)
+            )
+            transaction.set_rollback(True)
+        self.assertFalse(
+            follow_graph.is_following(self.other.pk, self.reader.pk)
+        )
+
+    def test_import_reloads_graph(self):
+        """Подписки, загруженные в обход сигналов, видны графу после
+        импорта."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'content.ndjson')
+        transfer.export(path)
+        User.objects.all().delete()
+        self.assertEqual(follow_graph.following_count(self.reader.pk), 0)
+        transfer.load(path)
+        reader = User.objects.get(username=self.reader.username)
+        author = User.objects.get(username=self.author.username)
+        self.assertTrue(follow_graph.is_following(reader.pk, author.pk))
+        self.assertEqual(follow_graph.followers_count(author.pk), 2)
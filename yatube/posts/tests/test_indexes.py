@@ -0,0 +1,68 @@
+import unittest
+
+from django.db import connection
+from django.test import TestCase
+from mixer.backend.django import mixer
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN')
+class QueryPlanTests(TestCase):
+    """Запросы лент читают индексы, а не всю таблицу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = mixer.blend(User)
+        cls.author = mixer.blend(User)
+        cls.group = mixer.blend(Group)
+        cls.post = mixer.blend(
+            Post, author=cls.author, group=cls.group, image=''
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset, index, sorted_by_index=True):
+        plan = self.plan(queryset)
+        self.assertTrue(
+            any(index in step for step in plan), f'{index} не в плане {plan}'
+        )
+        for step in plan:
+            self.assertFalse(
+                step.startswith('SCAN') and 'INDEX' not in step,
+                f'Полный просмотр таблицы: {plan}'
+            )
+            if sorted_by_index:
+                self.assertNotIn('TEMP B-TREE', step, plan)
+
+    def test_feed_queries_use_indexes(self):
+        for queryset, index in (
+            (Post.objects.for_feed().order_by('-pub_date', '-id')[:11],
+             'post_pub_date_idx'),
+            (self.group.posts.for_feed().order_by('-pub_date', '-id')[:11],
+             'post_group_pub_date_idx'),
+            (self.author.posts.for_feed()[:10], 'post_author_pub_date_idx'),
+            (self.post.comments.order_by('-created', '-id'),
+             'comment_post_created_idx'),
+            # Уникальное ограничение SQLite хранит в автоиндексе.
+            (Follow.objects.filter(user=self.user).values('author_id'),
+             'sqlite_autoindex_posts_follow'),
+            (Follow.objects.filter(author=self.author).values('user_id'),
+             'follow_author_user_idx'),
+        ):
+            with self.subTest(index=index):
+                self.assertUsesIndex(queryset, index)
+
+    def test_counts_use_indexes(self):
+        self.assertUsesIndex(
+            self.group.posts.order_by(), 'post_group_pub_date_idx'
+        )
+        self.assertUsesIndex(
+            Comment.objects.filter(post=self.post).order_by(),
+            'comment_post_created_idx'
+        )
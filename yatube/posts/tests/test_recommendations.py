@@ -0,0 +1,90 @@
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from .. import recommendations
+from ..models import Follow, FollowSuggestion, StagedSuggestion, User
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.reader, self.neighbour, self.first, self.second, self.third = (
+            mixer.cycle(5).blend(User)
+        )
+        for user, author in (
+            (self.reader, self.first),
+            (self.neighbour, self.first),
+            (self.neighbour, self.second),
+            (self.first, self.third),
+            (self.first, self.reader),
+        ):
+            Follow.objects.create(user=user, author=author)
+
+    def ranked(self, engine):
+        return dict(recommendations.get_engine(engine)(
+            *recommendations.load_follows(), 10, 2
+        ))
+
+    def test_cofollow_and_second_degree_scores(self):
+        """Автор подписки читателя весит больше автора, на которого
+        подписан читатель с общей подпиской; свои подписки и сам
+        читатель не предлагаются."""
+        self.assertEqual(self.ranked('python')[self.reader.pk], [
+            (self.third.pk, recommendations.SECOND_DEGREE_WEIGHT),
+            (self.second.pk, recommendations.COFOLLOW_WEIGHT),
+        ])
+
+    @skipUnless(
+        recommendations.vectorized_available(), 'Нет NumPy и SciPy'
+    )
+    def test_vectorized_engine_matches_python(self):
+        self.assertEqual(self.ranked('scipy'), self.ranked('python'))
+
+    def test_build_writes_batches_and_replaces_old_rows(self):
+        """Расчёт пишется пачками через промежуточную таблицу и
+        целиком заменяет прошлый."""
+        with mock.patch.object(recommendations, 'BATCH_SIZE', 1):
+            with mock.patch.object(
+                StagedSuggestion.objects, 'bulk_create',
+                wraps=StagedSuggestion.objects.bulk_create
+            ) as bulk_create:
+                self.assertEqual(
+                    recommendations.build(engine='python'), (3, 4)
+                )
+        self.assertGreater(bulk_create.call_count, 1)
+        self.assertEqual(recommendations.build(engine='python'), (3, 4))
+        self.assertEqual(FollowSuggestion.objects.count(), 4)
+        self.assertFalse(StagedSuggestion.objects.exists())
+
+    def test_suggestions_are_served_with_one_query(self):
+        out = StringIO()
+        call_command('build_suggestions', engine='python', stdout=out)
+        self.assertIn('Рекомендаций: 4 для 3 читателей', out.getvalue())
+        self.assertEqual(
+            FollowSuggestion.objects.filter(user=self.reader).count(), 2
+        )
+        with self.assertNumQueries(1):
+            suggested = recommendations.suggestions_for(self.reader)
+        self.assertEqual(suggested, [self.third, self.second])
+        Follow.objects.create(user=self.reader, author=self.third)
+        self.assertEqual(
+            recommendations.suggestions_for(self.reader), [self.second]
+        )
+        self.client.force_login(self.reader)
+        for page in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', kwargs={'username': self.third.username}),
+        ):
+            with self.subTest(page=page):
+                response = self.client.get(page)
+                self.assertEqual(
+                    response.context['suggestions'], [self.second]
+                )
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': self.second.username}
+        ))
+        self.assertEqual(response.context['suggestions'], [])
@@ -0,0 +1,94 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from ..models import Comment, Post, SearchStats, User
+from ..search import search_comments, search_posts
+from ..stemmer import stem, tokenize
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Разные формы слова сводятся к одной основе."""
+        forms = (
+            ('кошка', 'кошки', 'кошками'),
+            ('красивая', 'красивому', 'красивые'),
+            ('читали', 'читать', 'читал'),
+        )
+        for words in forms:
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+
+class SearchMixin:
+    def setUp(self):
+        cache.clear()
+        self.user = mixer.blend(User)
+        self.cats = Post.objects.create(
+            text='Наши кошки любят спать на солнце', author=self.user)
+        self.dogs = Post.objects.create(
+            text='Собака гуляет в парке', author=self.user)
+        self.commented = Post.objects.create(
+            text='Фотографии с прогулки', author=self.user)
+        self.comment = Comment.objects.create(
+            post=self.commented, author=self.user,
+            text='Какая милая кошка и ещё одна кошка!')
+
+    def test_search_finds_word_forms_in_posts_and_comments(self):
+        """Поиск находит формы слова в постах и комментариях,
+        выше — где слово встречается чаще."""
+        self.assertEqual(
+            search_posts('кошкам'), [self.commented.pk, self.cats.pk])
+        self.assertEqual(search_posts('собаки в парке'), [self.dogs.pk])
+        self.assertEqual(search_posts('жираф'), [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.dogs.text = 'Жираф гуляет в парке'
+        self.dogs.save()
+        self.assertEqual(search_posts('собака'), [])
+        self.assertEqual(search_posts('жирафы'), [self.dogs.pk])
+        self.dogs.delete()
+        self.assertEqual(search_posts('жираф'), [])
+
+    def test_search_comments(self):
+        """Поиск комментариев для админки находит только комментарии."""
+        self.assertEqual(search_comments('кошки'), [self.comment.pk])
+        self.assertEqual(search_comments('собака'), [])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты."""
+        response = self.client.get(reverse('posts:search'), {'q': 'кошки'})
+        self.assertEqual(
+            list(response.context['page_obj']), [self.commented, self.cats])
+        self.assertNotContains(response, self.dogs.text)
+
+
+@override_settings(SEARCH_BACKEND='fts5')
+class Fts5SearchTests(SearchMixin, TestCase):
+    pass
+
+
+@override_settings(SEARCH_BACKEND='python')
+class PythonSearchTests(SearchMixin, TestCase):
+    def stats(self):
+        stats = SearchStats.objects.get()
+        return stats.documents, stats.length
+
+    def test_stats_follow_index(self):
+        """Число документов и их длина в индексе поддерживаются
+        при изменении и удалении, без пересчёта на поиске."""
+        def length(*objects):
+            return sum(len(tokenize(obj.text)) for obj in objects)
+
+        self.assertEqual(self.stats(), (4, length(
+            self.cats, self.dogs, self.commented, self.comment)))
+        self.dogs.text = 'Жираф гуляет'
+        self.dogs.save()
+        self.assertEqual(self.stats(), (4, length(
+            self.cats, self.dogs, self.commented, self.comment)))
+        self.commented.delete()
+        self.assertEqual(self.stats(), (2, length(self.cats, self.dogs)))
+        with self.assertNumQueries(2):
+            search_posts('жираф')
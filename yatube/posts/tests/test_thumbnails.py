@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from .. import tasks, thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=mixer.blend(User),
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        self.url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def test_page_does_not_resize_inline(self):
+        """Пока миниатюры нет, страница показывает оригинал
+        и не создаёт миниатюру сама."""
+        response = self.client.get(self.url)
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(thumbnails.lookup_url(self.post.image, 'card'))
+
+    def test_pregenerated_thumbnail_is_used(self):
+        """После обработки страница показывает готовую миниатюру."""
+        tasks.schedule_thumbnails(self.post)
+        url = thumbnails.lookup_url(self.post.image, 'card')
+        self.assertIsNotNone(url)
+        self.assertContains(self.client.get(self.url), url)
+        profile = reverse('posts:profile', args=(self.post.author.username,))
+        self.assertContains(self.client.get(profile), url)
@@ -0,0 +1,70 @@
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from ..models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = mixer.blend(User)
+        cls.author = mixer.blend(User)
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def follow_index_posts(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост автора записывается в ленты подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = mixer.blend(Post, author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.follow_index_posts(), [post])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дозаполняет ленту, отписка очищает её."""
+        posts = mixer.cycle(3).blend(Post, author=self.author)
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), len(posts)
+        )
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.follow_index_posts(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора не раскладываются по лентам,
+        но попадают в ленту подписок при чтении."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = mixer.blend(Post, author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.follow_index_posts(), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, TASKS_EAGER=True)
+    def test_posts_stay_when_author_stops_being_popular(self):
+        """Посты, написанные автором в популярности, и подписка того
+        периода остаются в ленте, когда подписчиков стало меньше
+        порога."""
+        Follow.objects.create(user=self.user, author=self.author)
+        other = Follow.objects.create(
+            user=mixer.blend(User), author=self.author
+        )
+        post = mixer.blend(Post, author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        other.delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.follow_index_posts(), [post])
@@ -0,0 +1,96 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import transfer
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        call_command(
+            'generate_data', users=8, groups=2, posts=40, comments=30,
+            follows=3, seed=2, stdout=StringIO()
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'content.ndjson')
+
+    def snapshot(self):
+        return {
+            'groups': set(Group.objects.values_list('slug', 'title')),
+            'posts': set(Post.objects.values_list(
+                'pk', 'text', 'pub_date', 'author__username', 'group__slug'
+            )),
+            'comments': set(Comment.objects.values_list(
+                'pk', 'post_id', 'author__username', 'created'
+            )),
+            'follows': set(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        }
+
+    def clear(self):
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_round_trip(self):
+        """Выгрузка в пустую базу восстанавливает контент, счётчики
+        пересчитываются."""
+        before = self.snapshot()
+        counts = transfer.export(self.path, chunk_size=7)
+        self.assertEqual(counts['post'], 40)
+        self.clear()
+        call_command('import_content', self.path, batch_size=9,
+                     stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)), 40
+        )
+        self.assertFalse(os.path.exists(transfer.checkpoint_path(self.path)))
+
+    def test_interrupted_export_and_import_resume(self):
+        before = self.snapshot()
+        line = transfer._line
+        calls = []
+
+        def failing_line(model, fields):
+            calls.append(model)
+            if len(calls) == 50:
+                raise KeyboardInterrupt
+            return line(model, fields)
+
+        with mock.patch.object(transfer, '_line', failing_line):
+            with self.assertRaises(KeyboardInterrupt):
+                transfer.export(self.path, chunk_size=10)
+        transfer.export(self.path, chunk_size=10, resume=True)
+        self.clear()
+        save = transfer.Importer.save_comment
+        with mock.patch.object(transfer.Importer, 'save_comment',
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                transfer.load(self.path, batch_size=10, rebuild=False)
+        self.assertTrue(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        with mock.patch.object(transfer.Importer, 'save_comment', save):
+            transfer.load(self.path, batch_size=10, resume=True)
+        self.assertEqual(self.snapshot(), before)
+
+    def test_refuses_non_empty_database(self):
+        """Посты с теми же id уже в базе: загрузка не начинается."""
+        transfer.export(self.path)
+        with self.assertRaises(CommandError):
+            call_command('import_content', self.path, stdout=StringIO())
+        self.assertFalse(os.path.exists(transfer.checkpoint_path(self.path)))
+
+    def test_broken_file(self):
+        self.clear()
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('{"model": "user", "fields": {}}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_content', self.path, stdout=StringIO())
@@ -5,12 +5,15 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from mixer.backend.django import mixer
 from yatube.settings import POSTS_NUMBER
 
-from ..models import Follow, Group, Post, User
+from ..models import Comment, Follow, Group, Post, User
+from ..utils import encode_cursor
 
 COUNT_OF_POSTS = 15
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -80,21 +83,21 @@ class PostViewTests(TestCase):
         self.assertEqual(response.context['page_obj'][0], self.post)
 
     def test_cache_content_index_page(self):
-        """Проверка хранения и отчистка кэша на главной странице."""
-        response = self.authorized_client.get(reverse('posts:index'))
+        """Главная страница отдаётся из кэша, пока посты не менялись,
+        и пересобирается сразу после публикации нового поста."""
+        response = self.client.get(reverse('posts:index'))
         posts = response.content
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(reverse('posts:index'))
+        self.assertEqual(cached_response.content, posts)
         Post.objects.create(
             text='Проверка кэша',
             author=self.user,
             group=self.group
         )
-        old_response = self.authorized_client.get(reverse('posts:index'))
-        old_posts = old_response.content
-        self.assertEqual(old_posts, posts)
-        cache.clear()
-        new_response = self.authorized_client.get(reverse('posts:index'))
-        new_posts = new_response.content
-        self.assertNotEqual(old_posts, new_posts)
+        new_response = self.client.get(reverse('posts:index'))
+        self.assertNotEqual(new_response.content, posts)
+        self.assertContains(new_response, 'Проверка кэша')
 
     def test_post_detail_page_show_correct_context(self):
         """Шаблон post_detail сформирован
@@ -319,3 +322,157 @@ class FollowViewsTest(TestCase):
                          new_follow_index,
                          'Новая запись автора не пропала из ленты '
                          'пользователя после отписки от него.')
+
+
+@override_settings(POSTS_KEYSET_PAGINATION=True)
+class KeysetPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = mixer.blend(User)
+        cls.group = mixer.blend(Group)
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=cls.user, group=cls.group)
+            for i in range(COUNT_OF_POSTS)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_follow_cursors(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу:
+        index, group_posts, profile."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}))
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        for page in pages:
+            with self.subTest(page=page):
+                first = self.client.get(page).context['page_obj']
+                self.assertEqual(list(first), expected[:POSTS_NUMBER])
+                self.assertFalse(first.has_previous())
+                second = self.client.get(
+                    f'{page}?cursor={first.next_cursor}'
+                ).context['page_obj']
+                self.assertEqual(list(second), expected[POSTS_NUMBER:])
+                self.assertFalse(second.has_next())
+                back = self.client.get(
+                    f'{page}?cursor={second.previous_cursor}'
+                ).context['page_obj']
+                self.assertEqual(list(back), expected[:POSTS_NUMBER])
+                self.assertFalse(back.has_previous())
+
+    def test_deep_page_has_no_count_and_offset(self):
+        """Страница по курсору не выполняет COUNT(*) и OFFSET."""
+        first = self.client.get(reverse('posts:index')).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                f"{reverse('posts:index')}?cursor={first.next_cursor}")
+        sql = ' '.join(query['sql'] for query in queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_broken_cursor_is_bad_request(self):
+        """Испорченный курсор или курсор с чужими типами значений —
+        ответ 400 во всех лентах."""
+        client = Client()
+        client.force_login(self.user)
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:follow_index'))
+        cursors = (
+            'xyz',
+            encode_cursor(['2020-01-01T00:00:00', 'abc']),
+            encode_cursor(['2020-01-01T00:00:00', [1]]),
+            encode_cursor(['2020-01-01T00:00:00', None]),
+            encode_cursor([None, 1]),
+        )
+        for page in pages:
+            for cursor in cursors:
+                with self.subTest(page=page, cursor=cursor):
+                    response = client.get(page, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 400)
+
+
+class QueryCountViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = mixer.blend(User)
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.group = mixer.blend(Group)
+        cls.post = mixer.blend(
+            Post, author=cls.user, group=cls.group, image='')
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        return len(queries)
+
+    def add_posts_and_comments(self):
+        for _ in range(POSTS_NUMBER):
+            author = mixer.blend(User)
+            Follow.objects.get_or_create(user=self.user, author=author)
+            mixer.blend(
+                Post, author=author, group=mixer.blend(Group), image='')
+            mixer.blend(Post, author=self.user, group=self.group, image='')
+            mixer.blend(Comment, post=self.post, author=author)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Число запросов страниц не растёт вместе с числом постов
+        и комментариев на странице."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+        followed = mixer.blend(User)
+        Follow.objects.create(user=self.user, author=followed)
+        mixer.blend(Post, author=followed, image='')
+        before = {
+            page: self.count_queries(self.authorized_client, page)
+            for page in pages
+        }
+        self.add_posts_and_comments()
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertEqual(
+                    self.count_queries(self.authorized_client, page),
+                    before[page]
+                )
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_pages_fit_query_budget(self):
+        """Страницы укладываются в объявленный бюджет запросов и не
+        повторяют запросы одной формы."""
+        self.add_posts_and_comments()
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            reverse('posts:post_create'),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=' + self.post.text.split()[0],
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                cache.clear()
+                self.authorized_client.get(page)
+
+    def test_index_query_count(self):
+        """Главная страница для гостя — подсчёт и выборка постов."""
+        self.add_posts_and_comments()
+        with self.assertNumQueries(2):
+            self.client.get(reverse('posts:index'))
@@ -0,0 +1,71 @@
+from django.conf import settings
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.images import ImageFile
+
+from .cache import FEED_VERSION_KEY, bump_version, post_version_key
+
+# Служебная опция: до имени файла она не доходит.
+LOOKUP_OPTION = 'lookup_only'
+
+
+class ThumbnailName(Exception):
+    """Имя миниатюры, найденное без её создания."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.name = name
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который умеет только искать готовое.
+
+    Опции по умолчанию и имя файла считает сам sorl в ``get_thumbnail``;
+    при поиске он останавливается на имени, до чтения и обработки
+    картинки.
+    """
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        lookup_only = options.pop(LOOKUP_OPTION, False)
+        name = super()._get_thumbnail_filename(
+            source, geometry_string, options
+        )
+        if lookup_only:
+            raise ThumbnailName(name)
+        return name
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей или ``None``."""
+        options[LOOKUP_OPTION] = True
+        try:
+            self.get_thumbnail(file_, geometry_string, **options)
+        except ThumbnailName as found:
+            return default.kvstore.get(ImageFile(found.name, default.storage))
+        return None
+
+
+backend = PregeneratedThumbnailBackend()
+
+
+def get_geometry(alias):
+    thumbnail = dict(settings.POST_THUMBNAILS[alias])
+    return thumbnail.pop('geometry'), thumbnail
+
+
+def lookup_url(image, alias):
+    geometry, options = get_geometry(alias)
+    thumbnail = backend.lookup(image, geometry, **options)
+    return thumbnail.url if thumbnail else None
+
+
+def generate(image_name):
+    """Создаёт все зарегистрированные миниатюры изображения."""
+    for alias in settings.POST_THUMBNAILS:
+        geometry, options = get_geometry(alias)
+        backend.get_thumbnail(image_name, geometry, **options)
+
+
+def invalidate(post_id):
+    # Карточки и страницы с исходной картинкой нужно пересобрать.
+    bump_version(post_version_key(post_id))
+    bump_version(FEED_VERSION_KEY)
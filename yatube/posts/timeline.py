@@ -0,0 +1,115 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+
+
+def is_popular(author_id):
+    """Автор, чьи посты не раскладываются по лентам подписчиков."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def popular_following_ids(user):
+    return list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+
+
+def _bulk_add(entries):
+    entries = iter(entries)
+    batch = list(islice(entries, BATCH_SIZE))
+    while batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, BATCH_SIZE))
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_popular(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_add(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту посты автора, на которого подписались."""
+    if is_popular(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    _bulk_add(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def left_popular(author_id):
+    """Автор только что перестал быть популярным: подписчиков стало
+    на одного меньше порога."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT - 1
+    ).exists()
+
+
+def refill(author_id):
+    """Раскладывает посты автора, переставшего быть популярным, по
+    лентам всех подписчиков.
+
+    Пока автор популярен, его посты не раскладываются, а подписавшиеся
+    не получают дозаполнения: ленты подмешивают его посты при чтении.
+    Когда подписчиков становится меньше порога, подмешивание
+    прекращается, и без этого посты того периода пропали бы из лент.
+    Обратный переход ничего не теряет: разложенные записи остаются, а
+    новые посты подмешиваются при чтении.
+    """
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator(chunk_size=BATCH_SIZE):
+        backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def timeline_posts(user):
+    """Посты ленты подписок: разложенные заранее и популярных авторов."""
+    popular = popular_following_ids(user)
+    if not popular:
+        return Post.objects.filter(timeline_entries__user=user)
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(id__in=entries) | Q(author_id__in=popular)
+    )
+
+
+def rebuild(user=None):
+    """Пересобирает ленты заново по текущим подпискам."""
+    follows = Follow.objects.all()
+    if user is not None:
+        follows = follows.filter(user=user)
+        TimelineEntry.objects.filter(user=user).delete()
+    else:
+        TimelineEntry.objects.all().delete()
+    pairs = follows.values_list('user_id', 'author_id')
+    for user_id, author_id in pairs.iterator(chunk_size=BATCH_SIZE):
+        backfill(user_id, author_id)
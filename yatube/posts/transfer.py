@@ -0,0 +1,314 @@
+"""Выгрузка и загрузка контента в формате NDJSON.
+
+Каждая строка файла — объект ``{"model": ..., "fields": {...}}``.
+Группы, посты, комментарии и подписки идут именно в таком порядке,
+чтобы при загрузке всё, на что ссылается строка, уже было в базе.
+Пользователи записываются по ``username``, группы по ``slug``, посты
+и комментарии сохраняют свои ``id``, поэтому загрузка идёт только в
+базу без постов и комментариев: иначе пост с занятым ``id`` молча
+пропал бы, а его комментарии достались бы чужому посту.
+Отсутствующие пользователи создаются без пароля.
+
+Обе стороны читают и пишут потоком, а после каждой пачки сохраняют
+контрольную точку в файл ``<выгрузка>.checkpoint``; прерванную
+команду можно продолжить с неё. Загрузка идёт через ``bulk_create``
+с ``ignore_conflicts``, поэтому повтор пачки после сбоя ничего не
+дублирует.
+"""
+import json
+import os
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .dataset import manual_dates, rebuild_derived
+from .models import Comment, Follow, Group, Post, User
+
+CHUNK_SIZE = 2000
+
+# Поле выгрузки и путь к нему в ``values()``.
+EXPORT_FIELDS = {
+    'group': (Group, {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    }),
+    'post': (Post, {
+        'id': 'pk',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'updated': 'updated',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+    }),
+    'comment': (Comment, {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follow': (Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+MODELS = tuple(EXPORT_FIELDS)
+
+
+class TransferError(Exception):
+    pass
+
+
+def checkpoint_path(path):
+    return f'{path}.checkpoint'
+
+
+def read_checkpoint(path):
+    try:
+        with open(checkpoint_path(path), encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, state):
+    # Запись через временный файл: сбой не оставит половину точки.
+    temporary = f'{checkpoint_path(path)}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(state, file)
+    os.replace(temporary, checkpoint_path(path))
+
+
+def remove_checkpoint(path):
+    try:
+        os.remove(checkpoint_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def _isoformat(value):
+    # DjangoJSONEncoder отбрасывает микросекунды, а по дате и id
+    # строятся курсоры лент: даты должны вернуться без потерь.
+    return value.isoformat()
+
+
+def _line(model, fields):
+    return json.dumps(
+        {'model': model, 'fields': fields},
+        default=_isoformat, ensure_ascii=False
+    ).encode() + b'\n'
+
+
+def export(path, chunk_size=CHUNK_SIZE, resume=False, log=None):
+    """Выгружает контент в ``path`` и возвращает число строк по
+    моделям. При ``resume`` продолжает с контрольной точки."""
+    log = log or (lambda message: None)
+    state = read_checkpoint(path) if resume else None
+    if state is None:
+        state = {'model': MODELS[0], 'last_pk': 0, 'offset': 0,
+                 'counts': dict.fromkeys(MODELS, 0)}
+    else:
+        log(f'Продолжение с {state["model"]} после id {state["last_pk"]}')
+    with open(path, 'r+b' if state['offset'] else 'wb') as file:
+        # Хвост после точки мог остаться от прерванной пачки.
+        file.truncate(state['offset'])
+        file.seek(state['offset'])
+        for model in MODELS[MODELS.index(state['model']):]:
+            _export_model(file, path, model, state, chunk_size)
+            log(f'{model}: {state["counts"][model]}')
+    remove_checkpoint(path)
+    return state['counts']
+
+
+def _export_model(file, path, model, state, chunk_size):
+    model_class, fields = EXPORT_FIELDS[model]
+    rows = model_class.objects.filter(
+        pk__gt=state['last_pk'] if state['model'] == model else 0
+    ).order_by('pk').values_list('pk', *fields.values())
+    state.update(model=model, last_pk=0)
+    written = 0
+    for pk, *values in rows.iterator(chunk_size=chunk_size):
+        file.write(_line(model, dict(zip(fields, values))))
+        state['last_pk'] = pk
+        written += 1
+        if written % chunk_size == 0:
+            _save_export_state(file, path, state, model, written)
+            written = 0
+    _save_export_state(file, path, state, model, written)
+
+
+def _save_export_state(file, path, state, model, written):
+    file.flush()
+    os.fsync(file.fileno())
+    state['offset'] = file.tell()
+    state['counts'][model] += written
+    write_checkpoint(path, state)
+
+
+class Importer:
+    """Пишет пачки строк выгрузки, разрешая внешние ключи."""
+
+    def __init__(self):
+        self.users = {}
+        self.groups = {}
+        self.created_users = 0
+
+    def user_ids(self, names):
+        missing = set(names) - self.users.keys()
+        if missing:
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'id'))
+            missing -= self.users.keys()
+        if missing:
+            password = make_password(None)
+            User.objects.bulk_create(
+                (User(username=name, password=password) for name in missing),
+                ignore_conflicts=True
+            )
+            self.created_users += len(missing)
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'id'))
+        return self.users
+
+    def group_ids(self, slugs):
+        missing = {slug for slug in slugs if slug} - self.groups.keys()
+        if missing:
+            self.groups.update(Group.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'id'))
+            unknown = missing - self.groups.keys()
+            if unknown:
+                raise TransferError(
+                    f'Неизвестные группы: {", ".join(sorted(unknown))}'
+                )
+        return self.groups
+
+    def save(self, model, rows):
+        getattr(self, f'save_{model}')(rows)
+
+    def save_group(self, rows):
+        Group.objects.bulk_create(
+            (Group(**row) for row in rows), ignore_conflicts=True
+        )
+
+    def save_post(self, rows):
+        users = self.user_ids(row['author'] for row in rows)
+        groups = self.group_ids(row['group'] for row in rows)
+        with manual_dates(Post, 'pub_date', 'updated'):
+            Post.objects.bulk_create((
+                Post(
+                    id=row['id'],
+                    text=row['text'],
+                    pub_date=parse_datetime(row['pub_date']),
+                    updated=parse_datetime(row['updated']),
+                    author_id=users[row['author']],
+                    group_id=groups[row['group']] if row['group'] else None,
+                    image=row['image'],
+                ) for row in rows
+            ), ignore_conflicts=True)
+
+    def save_comment(self, rows):
+        users = self.user_ids(row['author'] for row in rows)
+        # Комментарии к постам, которых нет в базе, пропускаются.
+        posts = set(Post.objects.filter(
+            pk__in={row['post'] for row in rows}
+        ).values_list('pk', flat=True))
+        with manual_dates(Comment, 'created'):
+            Comment.objects.bulk_create((
+                Comment(
+                    id=row['id'],
+                    post_id=row['post'],
+                    author_id=users[row['author']],
+                    text=row['text'],
+                    created=parse_datetime(row['created']),
+                ) for row in rows if row['post'] in posts
+            ), ignore_conflicts=True)
+
+    def save_follow(self, rows):
+        users = self.user_ids(
+            name for row in rows for name in (row['user'], row['author'])
+        )
+        Follow.objects.bulk_create((
+            Follow(user_id=users[row['user']], author_id=users[row['author']])
+            for row in rows if row['user'] != row['author']
+        ), ignore_conflicts=True)
+
+
+def reset_sequences():
+    """После вставки с явными id счётчики первичных ключей (в
+    PostgreSQL — последовательности) должны смотреть за максимум."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [Post, Comment]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def _records(file):
+    """Пары «смещение строки — запись», в конце — ``(конец, None)``."""
+    while True:
+        position = file.tell()
+        line = file.readline()
+        if not line:
+            yield position, None
+            return
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise TransferError(f'Повреждённая строка в байте {position}')
+        if record.get('model') not in MODELS:
+            raise TransferError(
+                f'Неизвестная модель {record.get("model")!r} '
+                f'в байте {position}'
+            )
+        yield position, record
+
+
+def load(path, batch_size=CHUNK_SIZE, resume=False, rebuild=True,
+         log=None):
+    """Загружает выгрузку из ``path`` и возвращает число строк по
+    моделям. При ``resume`` продолжает с контрольной точки."""
+    log = log or (lambda message: None)
+    state = read_checkpoint(path) if resume else None
+    if state is None:
+        if Post.objects.exists() or Comment.objects.exists():
+            raise TransferError(
+                'В базе уже есть посты или комментарии: выгрузка '
+                'загружается только в пустую базу.'
+            )
+        state = {'offset': 0, 'counts': dict.fromkeys(MODELS, 0)}
+    else:
+        log(f'Продолжение с байта {state["offset"]}')
+    importer = Importer()
+    with open(path, 'rb') as file:
+        file.seek(state['offset'])
+        model, batch = None, []
+        for position, record in _records(file):
+            if batch and (record is None or record['model'] != model
+                          or len(batch) >= batch_size):
+                with transaction.atomic():
+                    importer.save(model, batch)
+                # Точка — начало первой строки, которая ещё не записана.
+                state['offset'] = position
+                state['counts'][model] += len(batch)
+                write_checkpoint(path, state)
+                batch = []
+            if record is not None:
+                model = record['model']
+                batch.append(record['fields'])
+    reset_sequences()
+    if importer.created_users:
+        log(f'Создано пользователей: {importer.created_users}')
+    if rebuild:
+        rebuild_derived(log)
+    remove_checkpoint(path)
+    return state['counts']
@@ -1,8 +1,215 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import HttpResponseBadRequest
 from yatube.settings import POSTS_NUMBER
 
+FEED_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('-created', '-id')
+PAGE_WINDOW_EACH_SIDE = 2
+PAGE_WINDOW_ENDS = 1
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values, backwards=False):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    payload = json.dumps(
+        [[value.isoformat() if hasattr(value, 'isoformat') else value
+          for value in values], int(backwards)],
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    padding = '=' * (-len(token) % 4)
+    try:
+        values, backwards = json.loads(
+            base64.urlsafe_b64decode(token + padding).decode()
+        )
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(token)
+    if not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values, bool(backwards)
+
+
+class KeysetPage(Sequence):
+    """Страница курсорной пагинации.
+
+    Повторяет ту часть интерфейса ``Page``, которой пользуются шаблоны,
+    но вместо номеров страниц отдаёт курсоры соседних страниц.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class KeysetPaginator:
+    """Пагинатор по ключу сортировки (seek method).
+
+    Вместо ``COUNT(*)`` и ``OFFSET`` фильтрует выборку по значениям
+    ключа последней показанной записи, поэтому любая страница стоит
+    столько же, сколько первая. Последнее поле ``ordering`` должно
+    быть уникальным (обычно ``id``).
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+    def _seek_filter(self, values, backwards):
+        condition = Q()
+        for position, field in enumerate(self.ordering):
+            descending = field.startswith('-')
+            lookup = 'lt' if descending != backwards else 'gt'
+            name = self.fields[position]
+            step = Q(**{f'{name}__{lookup}': values[position]})
+            for previous, value in zip(self.fields[:position], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        ]
+
+    def _parse_values(self, values):
+        """Значения курсора, приведённые к типам полей сортировки."""
+        if len(values) != len(self.ordering):
+            raise InvalidCursor(values)
+        model = self.object_list.model
+        parsed = []
+        for name, value in zip(self.fields, values):
+            try:
+                value = model._meta.get_field(name).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise InvalidCursor(values)
+            if value is None:
+                raise InvalidCursor(values)
+            parsed.append(value)
+        return parsed
+
+    def _cursor_for(self, obj, backwards):
+        return encode_cursor(
+            [getattr(obj, field) for field in self.fields], backwards
+        )
+
+    def get_page(self, cursor=None, strict=False):
+        """Возвращает страницу после курсора.
+
+        Битый курсор даёт первую страницу, а при ``strict`` —
+        исключение ``InvalidCursor``.
+        """
+        values, backwards = None, False
+        if cursor:
+            try:
+                values, backwards = decode_cursor(cursor)
+                values = self._parse_values(values)
+            except InvalidCursor:
+                if strict:
+                    raise
+                values, backwards = None, False
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, backwards))
+        ordering = self._reversed_ordering() if backwards else self.ordering
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        has_next = (values is not None and backwards) or (
+            not backwards and has_more
+        )
+        has_previous = values is not None and (not backwards or has_more)
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self._cursor_for(rows[-1], backwards=False)
+        if rows and has_previous:
+            previous_cursor = self._cursor_for(rows[0], backwards=True)
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+
+def page_window(number, num_pages, on_each_side=PAGE_WINDOW_EACH_SIDE,
+                on_ends=PAGE_WINDOW_ENDS):
+    """Номера страниц для ссылок: края и окно вокруг текущей.
+
+    ``None`` обозначает пропуск. Длина списка не зависит от числа
+    страниц, поэтому и разметка пагинатора не растёт вместе с лентой.
+    """
+    if num_pages <= (on_each_side + on_ends) * 2 + 3:
+        return list(range(1, num_pages + 1))
+    left = max(number - on_each_side, 1)
+    right = min(number + on_each_side, num_pages)
+    window = []
+    if left > on_ends + 2:
+        window.extend(range(1, on_ends + 1))
+        window.append(None)
+    else:
+        window.extend(range(1, left))
+    window.extend(range(left, right + 1))
+    if right < num_pages - on_ends - 1:
+        window.append(None)
+        window.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        window.extend(range(right + 1, num_pages + 1))
+    return window
+
+
+def reject_invalid_cursor(view):
+    """Отвечает 400 на испорченный курсор."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except InvalidCursor:
+            return HttpResponseBadRequest('Неверный курсор')
+    return wrapper
+
 
 def short_paginator(request, post_list):
+    """Страница ленты; испорченный курсор — ``InvalidCursor``."""
+    if settings.POSTS_KEYSET_PAGINATION:
+        paginator = KeysetPaginator(post_list, POSTS_NUMBER)
+        return paginator.get_page(request.GET.get('cursor'), strict=True)
     paginator = Paginator(post_list, POSTS_NUMBER)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
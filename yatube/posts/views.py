@@ -1,16 +1,28 @@
+from urllib.parse import urlencode
+
+from core.querylog import query_budget
+from core.ratelimit import ratelimit
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
-from yatube.settings import CACHE_STORAGE_TIME_IN_SEC
+from django.views.decorators.http import require_safe
+from yatube.settings import POSTS_NUMBER
 
+from . import comments, follow_graph, recommendations
+from .cache import cache_feed_page
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
-from .utils import short_paginator
+from .search import search_posts
+from .timeline import timeline_posts
+from .utils import InvalidCursor, reject_invalid_cursor, short_paginator
 
 
-@cache_page(CACHE_STORAGE_TIME_IN_SEC, key_prefix='index_page')
+@query_budget(4)
+@cache_feed_page(key_prefix='index_page')
+@reject_invalid_cursor
 def index(request):
-    post_list = Post.objects.select_related('author', 'group')
+    post_list = Post.objects.for_feed()
     page_obj = short_paginator(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -18,9 +30,11 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(5)
+@reject_invalid_cursor
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
     page_obj = short_paginator(request, posts)
     context = {
         'group': group,
@@ -30,34 +44,90 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(7)
+@reject_invalid_cursor
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    post_list = author.posts.for_feed()
     page_obj = short_paginator(request, post_list)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author
-    ).exists()
+    following = request.user.is_authenticated and follow_graph.is_following(
+        request.user.pk, author.pk
+    )
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
+        'following': following,
+        'suggestions': recommendations.suggestions_for(
+            request.user, exclude=author.pk
+        ),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(4)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id
+    )
+    cursor = request.GET.get('cursor')
+    if cursor:
+        comments_html = comments.render_page(
+            post.pk, comments.get_page(post.pk, cursor)
+        )
+    else:
+        comments_html = comments.first_page(post.pk)
     form = CommentForm()
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments_html': comments_html,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(4)
+@require_safe
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    try:
+        page = comments.get_page(
+            post.pk, request.GET.get('cursor'), strict=True
+        )
+    except InvalidCursor:
+        return HttpResponseBadRequest('Неверный курсор')
+    html = comments.render_page(post.pk, page)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'html': html, 'next': page.next_cursor})
+    return HttpResponse(html)
+
+
+@query_budget(4)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    post_ids = search_posts(query) if query else []
+    page_obj = Paginator(post_ids, POSTS_NUMBER).get_page(
+        request.GET.get('page')
+    )
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[post_id] for post_id in page_obj.object_list
+        if post_id in posts
+    ]
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'pagination_query': urlencode({'q': query}) + '&' if query else '',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(3)
 @login_required
+@ratelimit('20/h', burst=5)
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(request.POST, files=request.FILES or None)
@@ -70,6 +140,7 @@ def post_create(request):
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@query_budget(5)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -93,6 +164,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('10/m', burst=5)
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -104,17 +176,21 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(6)
 @login_required
+@reject_invalid_cursor
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = timeline_posts(request.user).for_feed()
     page_obj = short_paginator(request, post_list)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'suggestions': recommendations.suggestions_for(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@ratelimit('30/m', burst=10, methods=None)
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -0,0 +1,24 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'name', 'status', 'attempts', 'run_at', 'locked_by', 'created'
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key')
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        queryset.filter(status=Task.FAILED).update(
+            status=Task.PENDING, attempts=0, finished=None,
+            run_at=timezone.now()
+        )
+
+    retry.short_description = 'Повторить выбранные задачи'
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,51 @@
+import signal
+
+from core.cache import is_process_local
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from taskqueue.worker import POOLS, Worker
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pool', choices=POOLS, default='thread',
+            help='Пул потоков или процессов.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Сколько задач выполнять одновременно.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда готовых к запуску задач не останется.'
+        )
+
+    def handle(self, *args, **options):
+        # Задачи сбрасывают версии кэша (карточки постов с миниатюрами,
+        # ленты): в кэше своего процесса веб-процессы этого не увидят.
+        if is_process_local(caches['default']):
+            raise CommandError(
+                'Кэш default живёт в памяти процесса, и изменения воркера '
+                'не дойдут до сайта. Запустите воркер с общим кэшем '
+                '(YATUBE_CACHE=sqlite или memcached) или включите '
+                'YATUBE_TASKS_EAGER=1.'
+            )
+        worker = Worker(
+            concurrency=options['concurrency'], pool=options['pool'],
+            poll_interval=options['poll_interval']
+        )
+        # По сигналу воркер дожидается начатых задач и выходит.
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        processed = worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Воркер {worker.name} выполнил задач: {processed}.'
+        ))
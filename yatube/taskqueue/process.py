@@ -0,0 +1,16 @@
+"""Точки входа дочерних процессов пула воркера.
+
+Модуль не импортирует модели: процесс, запущенный через ``spawn``,
+сначала распаковывает ссылки на эти функции и только потом
+настраивает Django.
+"""
+import django
+
+
+def init():
+    django.setup()
+
+
+def execute(task_id):
+    from .worker import execute
+    return execute(task_id)
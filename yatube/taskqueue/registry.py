@@ -0,0 +1,76 @@
+"""Регистрация фоновых задач и постановка их в очередь.
+
+Задача — функция модуля ``tasks`` приложения, обёрнутая декоратором
+``task``. Аргументы задачи сохраняются в JSON, поэтому передавать
+нужно идентификаторы и строки, а не объекты моделей. При
+``TASKS_EAGER`` задачи выполняются сразу, без очереди.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Task
+
+_registry = {}
+
+
+class UnknownTask(LookupError):
+    pass
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_attempts=None):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return enqueue(self, *args, **kwargs)
+
+
+def task(name=None, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу."""
+    def decorator(func):
+        registered = TaskFunction(
+            func, name or f'{func.__module__}.{func.__name__}', max_attempts
+        )
+        _registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise UnknownTask(f'Задача {name} не зарегистрирована')
+
+
+def enqueue(task, *args, key=None, countdown=0, **kwargs):
+    """Ставит задачу в очередь и возвращает её запись.
+
+    Задача с уже известным ``key`` второй раз не ставится — вернётся
+    существующая запись. ``countdown`` откладывает запуск на столько
+    секунд.
+    """
+    if settings.TASKS_EAGER:
+        task(*args, **kwargs)
+        return None
+    fields = {
+        'name': task.name,
+        'payload': json.dumps(
+            {'args': args, 'kwargs': kwargs}, cls=DjangoJSONEncoder
+        ),
+        'max_attempts': task.max_attempts or settings.TASKS_MAX_ATTEMPTS,
+        'run_at': timezone.now() + timedelta(seconds=countdown),
+    }
+    if key is None:
+        return Task.objects.create(**fields)
+    return Task.objects.get_or_create(key=key, defaults=fields)[0]
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from mixer.backend.django import mixer
+from posts.models import Follow, TimelineEntry, User
+
+from .models import Task
+from .registry import enqueue, task
+from .worker import Worker, execute
+
+calls = []
+
+
+@task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.broken', max_attempts=2)
+def broken():
+    raise RuntimeError('сломано')
+
+
+@override_settings(TASKS_EAGER=False)
+class EnqueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_idempotency_key(self):
+        """Задача с известным ключом не ставится второй раз."""
+        first = enqueue(record, 1, key='record:1')
+        second = enqueue(record, 2, key='record:1')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(calls, [])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        self.assertIsNone(record.delay(3))
+        self.assertEqual(calls, [3])
+        self.assertFalse(Task.objects.exists())
+
+    def test_retries_with_backoff_then_fails(self):
+        """Упавшая задача откладывается, после предела — ошибка."""
+        worker = Worker()
+        job = broken.delay()
+        self.assertEqual(worker.claim(10), [job.pk])
+        self.assertFalse(execute(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Task.PENDING)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('сломано', job.last_error)
+        self.assertEqual(worker.claim(10), [])
+        Task.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        worker.claim(10)
+        execute(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.FAILED, 2))
+
+    def test_bookkeeping_error_fails_task(self):
+        """Ошибка записи результата не оставляет задачу RUNNING."""
+        job = record.delay(5)
+        Worker().claim(1)
+        queryset = Task.objects.filter
+        errors = iter([OperationalError('database table is locked')])
+
+        def locked_once(*args, **kwargs):
+            for error in errors:
+                raise error
+            return queryset(*args, **kwargs)
+
+        with mock.patch.object(Task.objects, 'filter', locked_once):
+            with self.assertLogs('taskqueue.worker', 'ERROR'):
+                self.assertFalse(execute(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Task.PENDING)
+        self.assertIn('OperationalError', job.last_error)
+
+    def test_stale_tasks_return_to_queue(self):
+        job = record.delay(4)
+        Worker(name='пропавший').claim(1)
+        Task.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        worker = Worker()
+        self.assertEqual(worker.release_stale(), 1)
+        self.assertEqual(worker.claim(1), [job.pk])
+
+    def test_stale_task_without_attempts_fails(self):
+        """Задача, исчерпавшая попытки на зависших воркерах, не
+        возвращается в очередь."""
+        job = broken.delay()
+        Task.objects.filter(pk=job.pk).update(
+            status=Task.RUNNING, attempts=2,
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        with self.assertLogs('taskqueue.worker', 'ERROR'):
+            self.assertEqual(Worker().release_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Task.FAILED)
+
+
+@override_settings(TASKS_EAGER=False)
+class WorkerTests(TransactionTestCase):
+    def test_command_needs_shared_cache(self):
+        """Воркер с кэшем в памяти процесса не запускается."""
+        with mock.patch(
+            'taskqueue.management.commands.worker.is_process_local',
+            return_value=True
+        ), self.assertRaises(CommandError):
+            call_command('worker', burst=True)
+
+    def test_post_side_effects_run_in_worker(self):
+        """Создание поста только ставит задачи, ленты подписчиков
+        заполняет воркер."""
+        author, reader = mixer.blend(User), mixer.blend(User)
+        Follow.objects.create(user=reader, author=author)
+        self.client.force_login(author)
+        self.client.post(reverse('posts:post_create'), {'text': 'Новость'})
+        self.assertFalse(TimelineEntry.objects.filter(user=reader).exists())
+        self.assertTrue(Task.objects.filter(status=Task.PENDING).exists())
+        # Одна задача за раз: тестовая база SQLite в памяти не держит
+        # параллельную запись из нескольких потоков.
+        processed = Worker(concurrency=1, poll_interval=0.01).run(burst=True)
+        self.assertEqual(processed, Task.objects.count())
+        self.assertTrue(TimelineEntry.objects.filter(user=reader).exists())
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
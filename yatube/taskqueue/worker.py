@@ -0,0 +1,207 @@
+"""Воркер очереди задач.
+
+Воркер забирает готовые к запуску задачи условным ``UPDATE`` — запись
+достаётся тому, чей запрос первым сменил состояние, поэтому несколько
+воркеров могут работать с одной базой. Задачи выполняются в пуле
+потоков или процессов. Упавшая задача возвращается в очередь с
+экспоненциальной задержкой, после ``max_attempts`` попыток она
+помечается ошибкой. Задачи, взятые воркером, который не отчитался за
+``TASKS_LOCK_TIMEOUT`` секунд, снова становятся доступны.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import time
+import traceback
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import process
+from .models import Task
+from .registry import get_task
+
+logger = logging.getLogger(__name__)
+
+POOLS = ('thread', 'process')
+PURGE_INTERVAL = 3600
+
+
+def backoff(attempts):
+    """Задержка перед следующей попыткой: растёт вдвое с каждой
+    попыткой, разбросана на ±20%, чтобы повторы не шли волной."""
+    delay = min(
+        settings.TASKS_RETRY_DELAY * 2 ** max(attempts - 1, 0),
+        settings.TASKS_RETRY_MAX_DELAY
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+def execute(task_id):
+    """Выполняет взятую в работу задачу и записывает результат."""
+    close_old_connections()
+    task = None
+    try:
+        task = Task.objects.get(pk=task_id)
+        try:
+            payload = json.loads(task.payload)
+            get_task(task.name)(*payload['args'], **payload['kwargs'])
+        except Exception:
+            fail(task, traceback.format_exc())
+            return False
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.DONE, finished=timezone.now(), last_error=''
+        )
+        return True
+    except Exception:
+        # Ошибка учёта, а не задачи (например, занятая база): без
+        # записи задача висела бы RUNNING до TASKS_LOCK_TIMEOUT.
+        logger.exception('Задача %s: не удалось записать состояние', task_id)
+        if task is not None:
+            try:
+                fail(task, traceback.format_exc())
+            except Exception:
+                logger.exception(
+                    'Задача %s вернётся в очередь по TASKS_LOCK_TIMEOUT',
+                    task_id
+                )
+        return False
+    finally:
+        close_old_connections()
+
+
+def fail(task, error):
+    now = timezone.now()
+    if task.attempts >= task.max_attempts:
+        logger.error('Задача %s (%s) не выполнена: %s',
+                     task.pk, task.name, error)
+        changes = {'status': Task.FAILED, 'finished': now}
+    else:
+        logger.warning('Задача %s (%s), попытка %s: %s',
+                       task.pk, task.name, task.attempts, error)
+        changes = {
+            'status': Task.PENDING,
+            'run_at': now + timedelta(seconds=backoff(task.attempts)),
+        }
+    Task.objects.filter(pk=task.pk).update(
+        locked_by='', last_error=error[-5000:], **changes
+    )
+
+
+class Worker:
+    def __init__(self, concurrency=4, pool='thread', poll_interval=1.0,
+                 name=None):
+        if pool not in POOLS:
+            raise ValueError(f'Неизвестный пул: {pool}')
+        self.concurrency = max(concurrency, 1)
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopped = False
+        self.purged_at = 0
+
+    def make_executor(self):
+        if self.pool == 'process':
+            return ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=process.init,
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix='task'
+        )
+
+    def release_stale(self):
+        """Возвращает в очередь задачи зависших воркеров. Задача, чьи
+        попытки кончились, помечается ошибкой: иначе задача, которая
+        убивает или вешает воркер, повторялась бы бесконечно."""
+        now = timezone.now()
+        stale = Task.objects.filter(
+            status=Task.RUNNING,
+            locked_at__lt=now - timedelta(
+                seconds=settings.TASKS_LOCK_TIMEOUT
+            )
+        )
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Task.FAILED, locked_by='', finished=now,
+            last_error='Воркер не отчитался о задаче за TASKS_LOCK_TIMEOUT'
+        )
+        if failed:
+            logger.error('Задач зависших воркеров не выполнено: %s', failed)
+        return stale.update(status=Task.PENDING, locked_by='')
+
+    def purge(self):
+        """Удаляет выполненные задачи старше ``TASKS_KEEP_DONE``."""
+        self.purged_at = time.monotonic()
+        border = timezone.now() - timedelta(seconds=settings.TASKS_KEEP_DONE)
+        return Task.objects.filter(
+            status=Task.DONE, finished__lt=border
+        ).delete()[0]
+
+    def claim(self, limit):
+        """Берёт в работу до ``limit`` задач, готовых к запуску."""
+        now = timezone.now()
+        candidates = Task.objects.filter(
+            status=Task.PENDING, run_at__lte=now
+        ).order_by('run_at', 'id').values_list('pk', 'attempts')[:limit]
+        claimed = []
+        for pk, attempts in candidates:
+            taken = Task.objects.filter(
+                pk=pk, status=Task.PENDING, attempts=attempts
+            ).update(
+                status=Task.RUNNING, attempts=attempts + 1,
+                locked_by=self.name, locked_at=now
+            )
+            if taken:
+                claimed.append(pk)
+        return claimed
+
+    def stop(self, *args):
+        self.stopped = True
+
+    def run(self, burst=False):
+        """Обрабатывает очередь до ``stop()``; при ``burst`` — пока
+        есть готовые задачи. Возвращает число выполненных задач."""
+        processed = 0
+        running = set()
+        target = execute if self.pool == 'thread' else process.execute
+        with self.make_executor() as executor:
+            while not self.stopped:
+                if time.monotonic() - self.purged_at > PURGE_INTERVAL:
+                    self.purge()
+                self.release_stale()
+                free = self.concurrency - len(running)
+                claimed = self.claim(free) if free > 0 else []
+                for pk in claimed:
+                    running.add(executor.submit(target, pk))
+                if not running:
+                    if burst:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                done, running = wait(
+                    running, timeout=self.poll_interval,
+                    return_when=FIRST_COMPLETED
+                )
+                processed += self.count(done)
+            processed += self.count(wait(running).done)
+        return processed
+
+    @staticmethod
+    def count(futures):
+        processed = 0
+        for future in futures:
+            error = future.exception()
+            if error is None:
+                processed += 1
+            else:
+                logger.error('Сбой пула воркера', exc_info=error)
+        return processed
@@ -0,0 +1,24 @@
+"""ASGI-точка входа: потоки событий лент и все страницы Django.
+
+Запуск любым ASGI-сервером, например ``uvicorn yatube.asgi:application``.
+"""
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+# Под ASGI потоки событий лент есть, и страницы подключают баннер.
+os.environ.setdefault('YATUBE_EVENTS_URL', '/events/')
+
+django_application = get_wsgi_application()
+
+from core.asgi import Router, WsgiBridge  # noqa: E402
+from core.template_backends import warm_up  # noqa: E402
+from django.conf import settings  # noqa: E402
+from posts.events import routes  # noqa: E402
+
+warm_up()
+
+application = Router(
+    routes(settings.EVENTS_URL), WsgiBridge(django_application)
+)
@@ -0,0 +1,74 @@
+"""Профили кэша для ``settings.CACHES``.
+
+Профиль выбирается переменной окружения ``YATUBE_CACHE``. ``local`` —
+кэш в памяти процесса для разработки и тестов; ``sqlite`` и
+``memcached`` — двухуровневый кэш (``core.cache.TieredCache``), в
+котором L1 живёт в процессе, а L2 общий для всех воркеров.
+"""
+import os
+
+# L1: сколько секунд процесс держит значение без L2, его пределы и как
+# часто он читает рассылку об изменениях от других процессов.
+TIERED_OPTIONS = {
+    'L2': 'shared',
+    'L1_TIMEOUT': 60,
+    'L1_MAX_ENTRIES': 5000,
+    'L1_MAX_BYTES': 64 * 1024 * 1024,
+    'SYNC_INTERVAL': 0.5,
+}
+
+
+def local(base_dir):
+    return {
+        'default': {
+            'BACKEND': 'core.cache.MeteredLocMemCache',
+        },
+    }
+
+
+def tiered(shared):
+    return {
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'LOCATION': 'default',
+            'TIMEOUT': 300,
+            'OPTIONS': TIERED_OPTIONS,
+        },
+        'shared': shared,
+    }
+
+
+def sqlite(base_dir):
+    """L2 в файле SQLite: общий для воркеров одной машины."""
+    return tiered({
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(base_dir, 'cache.sqlite3')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    })
+
+
+def memcached(base_dir):
+    """L2 в memcached или совместимом сервере."""
+    return tiered({
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ.get('YATUBE_MEMCACHED', '127.0.0.1:11211'),
+    })
+
+
+PROFILES = {
+    'local': local,
+    'sqlite': sqlite,
+    'memcached': memcached,
+}
+
+
+def get_profile(name, base_dir):
+    try:
+        return PROFILES[name](base_dir)
+    except KeyError:
+        raise ValueError(
+            f'Неизвестный профиль кэша {name!r}, '
+            f'доступны: {", ".join(PROFILES)}'
+        )
@@ -0,0 +1,74 @@
+"""Профили базы данных для ``settings.DATABASES``.
+
+Профиль выбирается переменной окружения ``YATUBE_DATABASE``; код
+приложений от выбора не зависит.
+"""
+import os
+
+# Прагмы SQLite выставляет обработчик connection_created из core.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite(base_dir):
+    """SQLite в режиме WAL: читатели не ждут пишущих.
+
+    ``synchronous=NORMAL`` в WAL не теряет целостность, а
+    ``busy_timeout`` заставляет конкурирующую запись подождать
+    вместо немедленной ошибки «database is locked».
+    """
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'YATUBE_DB_NAME', os.path.join(base_dir, 'db.sqlite3')
+        ),
+        'OPTIONS': {
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        },
+        'PRAGMAS': SQLITE_PRAGMAS,
+    }
+
+
+def postgresql(base_dir):
+    """PostgreSQL за пулером соединений (PgBouncer).
+
+    Соединения живут ``CONN_MAX_AGE`` секунд, а серверные курсоры
+    выключены: в режиме пула по транзакциям они не переживают
+    ``COMMIT``. Драйвер в requirements.txt не входит, его ставят
+    отдельно: ``pip install 'psycopg2>=2.7,<2.9'`` (с 2.9 Django 2.2
+    не работает).
+    """
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('YATUBE_DB_NAME', 'yatube'),
+        'USER': os.environ.get('YATUBE_DB_USER', 'yatube'),
+        'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('YATUBE_DB_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('YATUBE_DB_PORT', '6432'),
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_DB_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': True,
+        'OPTIONS': {
+            'connect_timeout': 5,
+        },
+    }
+
+
+PROFILES = {
+    'sqlite': sqlite,
+    'postgresql': postgresql,
+}
+
+
+def get_profile(name, base_dir):
+    try:
+        return PROFILES[name](base_dir)
+    except KeyError:
+        raise ValueError(
+            f'Неизвестный профиль базы данных {name!r}, '
+            f'доступны: {", ".join(PROFILES)}'
+        )
@@ -1,12 +1,14 @@
 import os
 
 from django.core.management.utils import get_random_secret_key
+from yatube import caches, databases
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = get_random_secret_key()
 
-DEBUG = True
+# В продакшене YATUBE_DEBUG=0: кэш шаблонов, без панели отладки.
+DEBUG = os.environ.get('YATUBE_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -20,6 +22,8 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'taskqueue.apps.TaskQueueConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -31,11 +35,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.querylog.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -45,34 +52,57 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# Доля запросов, с которых снимаются подробные метрики, и адреса,
+# которым отдаётся /metrics.
+METRICS_SAMPLE_RATE = 0.1
+METRICS_ALLOWED_IPS = [
+    '127.0.0.1',
+]
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Вне режима отладки шаблоны компилируются один раз на процесс,
+# wsgi.py прогревает этот кэш при старте воркера.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.events.events',
             ],
         },
     },
 ]
 
+# APP_DIRS не задан, потому что при заданных loaders Django его не
+# разрешает; шаблоны приложений по-прежнему находит app_directories.Loader
+# из TEMPLATE_LOADERS. Проверка панели отладки смотрит только на флаг.
+SILENCED_SYSTEM_CHECKS = ['debug_toolbar.W006']
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# Профиль базы данных из yatube/databases.py: 'sqlite' (WAL) или
+# 'postgresql' (через пулер соединений; нужен отдельно установленный
+# psycopg2, см. databases.postgresql).
+DATABASE_PROFILE = os.environ.get('YATUBE_DATABASE', 'sqlite')
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': databases.get_profile(DATABASE_PROFILE, BASE_DIR),
 }
 
 
@@ -106,6 +136,14 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 POSTS_NUMBER = 10
+COMMENTS_NUMBER = 20
+
+# Курсорная пагинация лент по (pub_date, id) вместо COUNT(*) и OFFSET.
+POSTS_KEYSET_PAGINATION = False
+
+# Посты авторов с таким числом подписчиков не раскладываются по лентам
+# подписок при публикации, а подмешиваются в ленту при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'), ]
 
@@ -120,11 +158,110 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHE_STORAGE_TIME_IN_SEC = 20
-
+# Миниатюры картинок постов создаются фоновой задачей после сохранения
+# поста, шаблоны берут только готовые.
+POST_THUMBNAILS = {
+    'card': {'geometry': '960x339', 'crop': 'center', 'upscale': True},
+}
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# Фоновые задачи (taskqueue) хранятся в базе и выполняются командой
+# manage.py worker. При TASKS_EAGER задачи выполняются сразу, без
+# очереди и воркера. Упавшая задача повторяется через TASKS_RETRY_DELAY
+# секунд, задержка удваивается до TASKS_RETRY_MAX_DELAY. Воркер меняет
+# версии в кэше, поэтому с профилем кэша local (в памяти процесса) он
+# не запускается: нужен общий профиль sqlite или memcached.
+TASKS_EAGER = os.environ.get(
+    'YATUBE_TASKS_EAGER', '1' if DEBUG else '0'
+) == '1'
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_DELAY = 5
+TASKS_RETRY_MAX_DELAY = 600
+# Через сколько секунд задача зависшего воркера снова попадает в
+# очередь и сколько хранятся выполненные задачи.
+TASKS_LOCK_TIMEOUT = 300
+TASKS_KEEP_DONE = 7 * 24 * 60 * 60
+
+# Ограничение частоты запросов (core.ratelimit): имя адреса → правило
+# token bucket. rate — скорость наполнения ведра («число/s|m|h|d»),
+# burst — его объём, key — 'user' или 'ip', methods — какие методы
+# считать. Правила здесь заменяют объявленные декоратором ratelimit,
+# None снимает ограничение. Вёдра хранятся в кэше RATELIMIT_CACHE
+# (задаётся ниже вместе с CACHES).
+RATELIMITS = {
+    'users:login': {'rate': '10/m', 'key': 'ip'},
+    'users:password_reset': {'rate': '5/h', 'burst': 3, 'key': 'ip'},
 }
+
+# Потоки событий лент (posts.events) в yatube/asgi.py: пауза между
+# пингами простаивающего соединения в секундах и число потоков, в
+# которых ASGI-воркер выполняет синхронный Django.
+EVENTS_HEARTBEAT = 15
+ASGI_THREADS = 20
+# Адрес потоков событий. yatube/asgi.py задаёт его сам; под WSGI он
+# пуст, и баннер новых постов не выводится. Если потоки отдаёт
+# отдельный ASGI-воркер рядом с WSGI, YATUBE_EVENTS_URL задаётся обоим.
+EVENTS_URL = os.environ.get('YATUBE_EVENTS_URL', '')
+
+# Полнотекстовый поиск: 'fts5', 'python' или 'auto' — FTS5, если SQLite
+# его поддерживает, иначе инвертированный индекс в таблице.
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_RESULTS = 1000
+
+# Рекомендации «Кого почитать» пересчитывает manage.py build_suggestions.
+# Движок 'scipy', 'python' или 'auto' — разреженные матрицы, если
+# установлены NumPy и SciPy, иначе чистый Python. Сколько авторов
+# хранить и показывать читателю и скольких читателей считать за раз.
+RECOMMENDATIONS_ENGINE = 'auto'
+RECOMMENDATIONS_TOP_K = 20
+RECOMMENDATIONS_SHOWN = 5
+RECOMMENDATIONS_CHUNK_SIZE = 1000
+
+# Запросы дольше SLOW_QUERY_MS миллисекунд и запросы одной формы,
+# повторённые NPLUSONE_THRESHOLD раз за запрос, пишутся в журнал. При
+# QUERY_BUDGET_STRICT повторы и превышение бюджета представления
+# (core.querylog.query_budget) — ошибка. Формы запросов считаются
+# только в доле запросов NPLUSONE_SAMPLE_RATE, а при DEBUG и
+# QUERY_BUDGET_STRICT — во всех.
+SLOW_QUERY_MS = 100
+NPLUSONE_THRESHOLD = 5
+NPLUSONE_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+QUERY_BUDGET_STRICT = False
+
+# Куда manage.py benchmark сохраняет базовые линии замеров.
+BENCHMARK_DIR = os.path.join(BASE_DIR, 'benchmarks')
+
+# Сколько секунд один воркер может пересобирать устаревшую страницу,
+# пока остальные ждут его результат.
+CACHE_REBUILD_LOCK_TIMEOUT = 10
+# Сколько живут страницы лент. Смена версии сама делает страницу
+# недоступной, а срок освобождает ключи старых версий, не дожидаясь
+# вытеснения.
+FEED_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# То же для карточек постов и первых страниц комментариев: ключи со
+# старыми версиями освобождаются по сроку.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+COMMENTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Профиль кэша (yatube/caches.py): local, sqlite или memcached.
+CACHE_PROFILE = os.environ.get('YATUBE_CACHE', 'local')
+CACHES = caches.get_profile(CACHE_PROFILE, BASE_DIR)
+# Вёдра ограничения частоты меняются на каждом запросе: в двухуровневых
+# профилях они лежат прямо в общем L2, мимо L1 процессов, который
+# расходился бы между воркерами, и мимо рассылки его изменений.
+RATELIMIT_CACHE = 'shared' if 'shared' in CACHES else 'default'
+
+# Сессии в кэше SESSION_CACHE_ALIAS с записью в базу (core.sessions),
+# истёкшие удаляет manage.py purge_sessions. Пользователь сессии
+# берётся из кэша USER_CACHE и сбрасывается при его сохранении.
+SESSION_ENGINE = 'core.sessions'
+SESSION_CACHE_ALIAS = 'default'
+# ModelBackend остаётся вторым: сессии, открытые до кэширования
+# пользователя, хранят путь к нему и без него разлогинились бы. Вход
+# до него не доходит: CachedModelBackend сам отклоняет неверный пароль.
+AUTHENTICATION_BACKENDS = [
+    'core.auth_backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE = 'default'
+USER_CACHE_TIMEOUT = 5 * 60
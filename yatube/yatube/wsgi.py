@@ -5,3 +5,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Первый запрос нового воркера не должен разбирать шаблоны с диска.
+# Импорт после get_wsgi_application(): модуль читает настройки и реестр
+# шаблонов, которые готовы только после django.setup().
+from core.template_backends import warm_up  # noqa: E402
+
+warm_up()